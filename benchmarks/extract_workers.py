@@ -0,0 +1,44 @@
+"""Пропускна здатність читання PDF залежно від кількості процесів.
+
+    python benchmarks/extract_workers.py bulletin.pdf --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader  # noqa: E402
+from io import BytesIO  # noqa: E402
+import function  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as fh:
+        data = fh.read()
+    n_pages = len(PdfReader(BytesIO(data)).pages)
+    # Parallel path is forced so that small files can be measured too
+    function.MIN_PAGES_PER_WORKER = 1
+
+    print(f"{args.pdf}: {n_pages} сторінок, {len(data) / 1e6:.1f} MB")
+    print(f"{'workers':>8} {'best, s':>9} {'pages/s':>9} {'lines/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            lines = function.extract_lines(data, workers)
+            best = min(best, time.perf_counter() - start)
+        baseline = baseline or best
+        print(f"{workers:>8} {best:>9.3f} {n_pages / best:>9.1f} {len(lines) / best:>10.0f} {baseline / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Наскрізний бенчмарк конвеєра на синтетичному каталозі: час і пік пам'яті кожного етапу.
+
+    python benchmarks/pipeline.py --sizes 10000 100000 1000000
+    python benchmarks/pipeline.py --update-baseline
+
+Результати порівнюються зі збереженим benchmarks/baseline.json; код виходу 1, якщо є регресії.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import CATALOG_CACHE, read_catalog, write_catalog  # noqa: E402
+from clustering import (  # noqa: E402
+    MODEL_CACHE, SCALER_CACHE, STREAM_CACHE,
+    feature_frame, fit_clusters, scaled_features, silhouette_report, stream_clusters,
+)
+from export import EXPORT_CACHE, export_bytes  # noqa: E402
+from function import (  # noqa: E402
+    DEFAULT_COLUMN_SLICES, ENRICH_CACHE, LINES_CACHE, addColumns, extract_lines, slice_lines,
+)
+from plots import DENSITY_CACHE, FIGURE_CACHE, density_grid, lat_density, lat_scatter  # noqa: E402
+from rollups import ROLLUP_CACHE, Rollups  # noqa: E402
+from stats import DATE_INDEX_CACHE, DateIndex, cycle_statistics, hemisphere_trends  # noqa: E402
+from synthetic import format_lines, synthetic_raw, write_pdf  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [10_000, 100_000]
+
+# Stages that grow faster than linearly (or are slow per row) run on the first rows only
+DBSCAN_MAX_ROWS = 5_000
+XLSX_MAX_ROWS = 5_000
+PDF_MAX_ROWS = 2_000
+
+FEATURES = ["x_ray_class_num", "peak_flux", "L", "lat"]
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 1.0
+
+CACHES = [
+    ENRICH_CACHE, LINES_CACHE, CATALOG_CACHE, MODEL_CACHE, SCALER_CACHE, STREAM_CACHE,
+    EXPORT_CACHE, FIGURE_CACHE, DENSITY_CACHE, ROLLUP_CACHE, DATE_INDEX_CACHE,
+]
+
+
+def clear_caches():
+    for cache in CACHES:
+        cache.clear()
+
+
+def measure(fn, memory=True):
+    """(result, {"seconds", "peak_mb"}) — кожен етап рахує з нуля, з порожніми кешами.
+
+    Час міряється без tracemalloc (він уповільнює чистий Python у рази), пік пам'яті —
+    окремим повторним запуском під tracemalloc. Arrow-буфери tracemalloc не бачить.
+    """
+    clear_caches()
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        clear_caches()
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return result, {"seconds": round(seconds, 4), "peak_mb": peak}
+
+
+def run_size(n, workdir, memory=True, seed=0):
+    """Усі етапи на n синтетичних рядках."""
+    results = {}
+
+    def stage(name, fn, rows=n):
+        result, metrics = measure(fn, memory)
+        results[name] = dict(metrics, rows=rows)
+        peak = "" if metrics["peak_mb"] is None else f"{metrics['peak_mb']:9.1f} MB"
+        print(f"{n:>9} {name:<18} {rows:>9} {metrics['seconds']:9.3f}s {peak}")
+        return result
+
+    raw = synthetic_raw(n, seed)
+    lines = format_lines(raw)
+
+    sliced = stage("slice_lines", lambda: slice_lines(lines, DEFAULT_COLUMN_SLICES))
+    sliced["cycle"] = raw["cycle"]
+    df = stage("addColumns", lambda: addColumns(sliced.copy()))
+    key = f"synthetic-{n}-{seed}"
+
+    path = os.path.join(workdir, f"catalog_{n}.parquet")
+    stage("write_catalog", lambda: write_catalog(df, path))
+    stage("read_catalog", lambda: read_catalog(path))
+    date_index = stage("date_index", lambda: DateIndex(df))
+    stage("date_select", lambda: date_index.counts(*date_index.dates[[0, -1]], freq="M"))
+    stage("cycle_statistics", lambda: cycle_statistics(df))
+    stage("hemisphere_trends", lambda: hemisphere_trends(df))
+    stage("rollups", lambda: Rollups.from_events(df))
+
+    stage("lat_scatter", lambda: lat_scatter(
+        df, "benchmark", ["x_ray_class"], {"color": "x_ray_class"}, max_points=20_000
+    ))
+    stage("lat_density", lambda: lat_density(density_grid(df), "benchmark"))
+
+    X = feature_frame(df, FEATURES)[FEATURES]
+    _, X_scaled = stage("scale", lambda: scaled_features(X, key, FEATURES), rows=len(X))
+    # KMeans includes scaling: the caches are empty, so there is no warm start either
+    run, _ = stage("kmeans", lambda: fit_clusters(X, key, FEATURES, "KMeans", {"k": 5}), rows=len(X))
+    stage("silhouette", lambda: silhouette_report(X_scaled, run.labels), rows=len(X))
+    m = min(len(X), DBSCAN_MAX_ROWS)
+    stage("dbscan", lambda: fit_clusters(X.iloc[:m], f"{key}:{m}", FEATURES, "DBSCAN", {"eps": 0.5, "min_samples": 5}), rows=m)
+    stage("stream_clusters", lambda: stream_clusters(
+        path, key, FEATURES, "MiniBatchKMeans", {"k": 5}, chunk_rows=50_000
+    ), rows=len(X))
+
+    stage("export_csv", lambda: export_bytes(df, "csv", key))
+    stage("export_parquet", lambda: export_bytes(df, "parquet", key))
+    m = min(n, XLSX_MAX_ROWS)
+    stage("export_xlsx", lambda: export_bytes(df.head(m), "xlsx", f"{key}:{m}"), rows=m)
+
+    m = min(n, PDF_MAX_ROWS)
+    pdf_path = os.path.join(workdir, f"bulletin_{m}.pdf")
+    if not os.path.exists(pdf_path):
+        try:
+            write_pdf(lines[:m], pdf_path)
+        except RuntimeError as e:
+            print(f"{n:>9} {'pdf_extract':<18} пропущено: {e}")
+            return results
+    with open(pdf_path, "rb") as fh:
+        data = fh.read()
+    stage("pdf_extract", lambda: extract_lines(data, workers=1), rows=m)
+    return results
+
+
+def environment(memory):
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "tracemalloc": memory,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Регресії відносно базових значень: (розмір, етап, метрика, було, стало)."""
+    regressions = []
+    for size, stages in results.items():
+        for name, metrics in stages.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            for metric, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+                old, new = before.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + tolerance) and new - old > floor:
+                    regressions.append((size, name, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="записати результати як нову базу")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустиме погіршення, частка")
+    parser.add_argument("--no-memory", action="store_true", help="лише час, без другого запуску під tracemalloc")
+    parser.add_argument("--output", help="зберегти результати в JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    memory = not args.no_memory
+
+    print(f"{'rows':>9} {'stage':<18} {'stage rows':>9} {'time':>10} {'peak':>12}")
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            results[str(n)] = run_size(n, workdir, memory, args.seed)
+    report = {"environment": environment(memory), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Базу записано: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("Базових результатів немає — запустіть з --update-baseline")
+        return 0
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    if baseline.get("environment") != report["environment"]:
+        print(f"Увага: середовище бази інше: {baseline.get('environment')}")
+    regressions = compare(results, baseline, args.tolerance)
+    for size, name, metric, old, new in regressions:
+        print(f"РЕГРЕСІЯ {size:>9} {name:<18} {metric}: {old} -> {new} ({new / old:.2f}x)")
+    if not regressions:
+        print(f"Регресій немає (допуск {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Синтетичний каталог спалахів у форматі бюлетеня: рядки, CSV і PDF для бенчмарків.
+
+    python benchmarks/synthetic.py 100000 -o data/synthetic.csv --pdf synthetic.pdf --pdf-rows 5000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function import DEFAULT_COLUMN_SLICES  # noqa: E402
+
+# Start of each solar cycle; the flare belt drifts from ~30° to ~8° over a cycle (Spörer's law)
+CYCLE_STARTS = {"23": "1996-05-01", "24": "2008-12-01", "25": "2019-12-01"}
+CYCLE_END = "2030-12-31"
+
+CLASS_WEIGHTS = {"B": 0.05, "C": 0.55, "M": 0.34, "X": 0.06}
+IMPORTANCE = ["", "S", "1", "2", "3", "4"]
+BRIGHTNESS = ["", "N", "F", "B"]
+
+
+def pick(rng, values, n, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p)]
+
+
+def hhmm(minutes):
+    minutes = minutes % (24 * 60)
+    return pd.Series(minutes // 60).astype(str).str.zfill(2) + pd.Series(minutes % 60).astype(str).str.zfill(2)
+
+
+def synthetic_raw(n, seed=0, cycle=True):
+    """n сирих рядків каталогу (як після slice_lines), з усіма варіантами, які розбирає addColumns:
+
+    зсунуті координати, переставлені клас/важність, кирилиця в класі, ">" у потоці й часі,
+    перехід через північ, порожні поля, CME і протонні події.
+    """
+    rng = np.random.default_rng(seed)
+    starts = pd.to_datetime(list(CYCLE_STARTS.values()) + [CYCLE_END]).to_numpy()
+    cycle_idx = rng.choice(len(CYCLE_STARTS), n)
+    phase = rng.random(n)
+    dates = starts[cycle_idx] + (phase * (starts[cycle_idx + 1] - starts[cycle_idx])).astype("timedelta64[ns]")
+    dates = pd.DatetimeIndex(dates).floor("D")
+
+    # Butterfly diagram: latitude band follows the cycle phase
+    lat = np.clip(np.abs(rng.normal(30 - 22 * phase, 5)), 0, 60).astype(int)
+    lon = rng.integers(0, 91, n)
+    carrington = rng.integers(0, 360, n)
+    coord = pd.Series(
+        pick(rng, ["N", "S"], n) + pd.Series(lat).astype(str).str.zfill(2)
+        + pick(rng, ["E", "W"], n) + pd.Series(lon).astype(str).str.zfill(2)
+        + "L" + pd.Series(carrington).astype(str).str.zfill(3)
+    )
+    coord[rng.random(n) < 0.02] = ""
+
+    start = rng.integers(0, 24 * 60, n)
+    duration = rng.gamma(2.0, 25.0, n).astype(int) + 1
+    peak = start + (duration * rng.random(n)).astype(int)
+    end = start + duration  # past midnight for late flares
+    te = hhmm(end)
+    te[rng.random(n) < 0.05] = ">" + te
+    te[rng.random(n) < 0.02] = ""
+
+    classes = pick(rng, list(CLASS_WEIGHTS), n, p=list(CLASS_WEIGHTS.values()))
+    flux = pd.Series(np.round(rng.uniform(1.0, 9.9, n), 1)).astype(str)
+    optical = pd.Series(pick(rng, IMPORTANCE, n) + pick(rng, BRIGHTNESS, n))
+    flux[rng.random(n) < 0.01] = ">" + flux  # saturated detector, e.g. X>10
+    xray = pd.Series(classes + flux)
+    has_optical = optical != ""
+    xray = xray.where(~has_optical, xray + "/" + optical)
+    # Importance first, e.g. 1B/X2.6 (the parser swaps it back)
+    swapped = optical.str.match(r"[1234S]") & ~flux.str.startswith(">") & (rng.random(n) < 0.03)
+    xray[swapped] = optical[swapped] + "/" + classes[swapped] + flux[swapped]
+    cyrillic = rng.random(n) < 0.01
+    xray[cyrillic] = xray[cyrillic].str.replace("M", "М").str.replace("X", "Х")
+
+    cme = pd.Series(
+        pd.Series(start).map(lambda m: f"{m // 60:02d}{m % 60:02d}")
+        + "/" + pd.Series(rng.integers(100, 3000, n)).astype(str).str.zfill(4)
+        + "/" + pd.Series(rng.integers(0, 361, n)).astype(str).str.zfill(3)
+    )
+    cme = cme.where(rng.random(n) < 0.5, pick(rng, ["", "", "g"], n))
+    protons = pd.Series(
+        pd.Series(rng.integers(1, 31, n)).astype(str).str.zfill(2) + "|" + hhmm(end)
+        + "/" + pd.Series(rng.integers(10, 9999, n)).astype(str)
+    )
+    protons = protons.where(rng.random(n) < 0.07, pick(rng, ["", "", "", "?", "WL"], n))
+
+    raw = pd.DataFrame({
+        "ymd": dates.strftime("%Y%m%d"),
+        "to": hhmm(start),
+        "tm": hhmm(peak),
+        "te": te,
+        "xray/opt": xray,
+        "L": pd.Series(np.round(rng.gamma(1.5, 0.03, n), 3)).astype(str),
+        "coord": coord,
+        "AR": pd.Series(rng.integers(7900, 14000, n)).astype(str),
+        "radio": pick(rng, ["", "", "110", "270", "640", "3600"], n),
+        "mhr": pick(rng, ["", "", "19", "52", "200"], n),
+        "dynamic": pick(rng, ["", "", "", "II/2", "II/3"], n),
+        "sweep": pick(rng, ["", "", "", "IV/2", "?"], n),
+        "CME": cme,
+        "xray-hard": pick(rng, ["", "F /0924/12-25", "h/2102/100-300", "R3/0806/025-050"], n),
+        "protons": protons,
+    })
+    raw = raw.sort_values("ymd", kind="stable", ignore_index=True)
+    if cycle:
+        raw["cycle"] = np.asarray(list(CYCLE_STARTS), dtype=object)[
+            np.searchsorted(pd.to_datetime(list(CYCLE_STARTS.values())), pd.to_datetime(raw["ymd"]), "right") - 1
+        ]
+    return raw
+
+
+def format_lines(raw, column_slices=DEFAULT_COLUMN_SLICES):
+    """Рядки бюлетеня фіксованої ширини: кожне поле з початку свого зрізу, обрізане до його ширини."""
+    line = pd.Series("", index=raw.index)
+    for col, (start, end) in column_slices.items():
+        value = raw[col].fillna("").astype(str)
+        if end:
+            value = value.str.slice(0, end - start).str.pad(end - start, side="right")
+        line = line.str.pad(start, side="right") + value
+    return line.str.rstrip().tolist()
+
+
+def write_pdf(lines, path, lines_per_page=75):
+    """PDF у вигляді бюлетеня (моноширинний шрифт, колонтитул на кожній сторінці).
+
+    Вбудований Courier не має кирилиці — такі класи в PDF стають нерозбірними.
+    """
+    try:
+        from reportlab.lib.pagesizes import A3, landscape
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        raise RuntimeError("Для генерації PDF потрібен reportlab (pip install reportlab)")
+    c = canvas.Canvas(path, pagesize=landscape(A3))
+    for page_start in range(0, len(lines), lines_per_page):
+        c.setFont("Courier", 8)
+        c.drawString(20, 815, "Solar flare bulletin (synthetic)")
+        y = 800
+        for line in lines[page_start:page_start + lines_per_page]:
+            c.drawString(20, y, line)
+            y -= 10
+        c.drawString(20, 20, f"page {page_start // lines_per_page + 1}")
+        c.showPage()
+    c.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", type=int)
+    parser.add_argument("-o", "--output", default="data/synthetic.csv", help="сирий каталог (CSV)")
+    parser.add_argument("--pdf", help="також записати PDF-бюлетень")
+    parser.add_argument("--pdf-rows", type=int, help="рядків у PDF (за замовчуванням усі)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    raw = synthetic_raw(args.rows, args.seed)
+    raw.to_csv(args.output, index=False)
+    print(f"{len(raw)} рядків -> {args.output}")
+    if args.pdf:
+        lines = format_lines(raw.head(args.pdf_rows) if args.pdf_rows else raw)
+        write_pdf(lines, args.pdf)
+        print(f"{len(lines)} рядків -> {args.pdf}")
+
+
+if __name__ == "__main__":
+    main()
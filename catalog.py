@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from function import LRUCache, PARSER_VERSION, addColumns, atomic_path, compact_dtypes, enrich, file_lock
+from rollups import rollups_are_fresh, rollups_path_for, update_rollups
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # каталог вимкнено, сторінки працюють з CSV
+    pa = pq = None
+
+DEFAULT_CSV_PATH = "data/extracted_data.csv"
+DEFAULT_CATALOG_PATH = "data/extracted_data.parquet"
+
+CATALOG_CACHE = LRUCache(maxsize=8)
+
+# Row groups bound the memory of batch-wise reads (iter_catalog)
+CATALOG_ROW_GROUP = 100_000
+
+# Natural key of a flare event: the same row from two bulletins is stored once
+NATURAL_KEY = ["ymd", "to", "coord", "xray/opt"]
+
+
+def catalog_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def csv_provenance(csv_path, with_hash=True):
+    # Which CSV the catalog was built from: stat for the quick check, content hash for touched files
+    stat = os.stat(csv_path)
+    provenance = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    if with_hash:
+        h = hashlib.blake2b(digest_size=16)
+        with open(csv_path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+        provenance["blake2b"] = h.hexdigest()
+    return provenance
+
+
+def catalog_metadata(path):
+    return pq.read_schema(path).metadata or {}
+
+
+def catalog_source(path, metadata=None):
+    # Provenance of the CSV the catalog was last built from, or None
+    metadata = catalog_metadata(path) if metadata is None else metadata
+    return json.loads(metadata[b"source_csv"]) if b"source_csv" in metadata else None
+
+
+def appended_keys(path, metadata=None):
+    # Natural keys of the events append_catalog added on top of the source CSV
+    metadata = catalog_metadata(path) if metadata is None else metadata
+    return pd.Index(json.loads(metadata.get(b"appended_keys", b"[]")), dtype="uint64")
+
+
+def write_catalog(df, path=DEFAULT_CATALOG_PATH, source=None, appended=None):
+    # Typed columnar copy of the enriched catalog, tagged with the parser version and,
+    # if it was built from a CSV, that CSV's provenance and the keys appended on top of it
+    if pq is None:
+        return False
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"parser_version"] = str(PARSER_VERSION).encode()
+    if source:
+        metadata[b"source_csv"] = json.dumps(source).encode()
+    if appended is not None and len(appended):
+        metadata[b"appended_keys"] = json.dumps(appended.tolist()).encode()
+    with atomic_path(path) as tmp_path:
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path, row_group_size=CATALOG_ROW_GROUP)
+    return True
+
+
+def csv_in_sync(path, csv_path, metadata=None):
+    # Has the source CSV changed since the catalog was built from it? Without a CSV the
+    # catalog is the only copy; catalogs without provenance fall back to mtimes
+    if not csv_path or not os.path.exists(csv_path):
+        return True
+    metadata = catalog_metadata(path) if metadata is None else metadata
+    if b"source_csv" not in metadata:
+        return os.path.getmtime(csv_path) <= os.path.getmtime(path)
+    recorded = json.loads(metadata[b"source_csv"])
+    current = csv_provenance(csv_path, with_hash=False)
+    return all(recorded.get(key) == value for key, value in current.items())
+
+
+def catalog_is_fresh(path=DEFAULT_CATALOG_PATH, csv_path=DEFAULT_CSV_PATH):
+    # Stale if its source CSV changed or it was written by another parser version
+    if pq is None or not os.path.exists(path):
+        return False
+    metadata = catalog_metadata(path)
+    if metadata.get(b"parser_version") != str(PARSER_VERSION).encode():
+        return False
+    return csv_in_sync(path, csv_path, metadata)
+
+
+def read_catalog(path=DEFAULT_CATALOG_PATH, columns=None):
+    # Memoized by (path, mtime, columns); only the requested columns are read from disk
+    key = (path, os.stat(path).st_mtime_ns, tuple(columns) if columns else None)
+    df = CATALOG_CACHE.get(key)
+    if df is None:
+        df = pq.read_table(path, columns=list(columns) if columns else None).to_pandas()
+        df.attrs["parser_version"] = PARSER_VERSION
+        df.attrs["fingerprint"] = f"{path}@{key[1]}"
+        df.attrs["catalog_path"] = path
+        CATALOG_CACHE.put(key, df)
+    return df
+
+
+def catalog_key(path=DEFAULT_CATALOG_PATH):
+    # Same fingerprint read_catalog gives the frame it loads
+    return f"{path}@{os.stat(path).st_mtime_ns}"
+
+
+def iter_catalog(path=DEFAULT_CATALOG_PATH, columns=None, batch_rows=50_000):
+    """Каталог блоками по batch_rows рядків — пам'ять залежить від блоку, а не від розміру каталогу."""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def sync_catalog(path, csv_path):
+    """Оновлює каталог після зміни CSV чи версії парсера; викликач тримає file_lock(path).
+
+    Події, дописані в каталог через append_catalog, зберігаються: їхні ключі записані
+    в метадані, тож рядки, змінені чи видалені з CSV, не переживають синхронізацію.
+    """
+    existing, source, metadata = None, None, {}
+    appended = pd.Index([], dtype="uint64")
+    if os.path.exists(path):
+        metadata = catalog_metadata(path)
+        source = catalog_source(path, metadata)
+        appended = appended_keys(path, metadata)
+        existing = pq.read_table(path).to_pandas()
+        if metadata.get(b"parser_version") != str(PARSER_VERSION).encode():
+            # Written by another parser version: re-enrich the stored rows
+            existing = addColumns(existing)
+
+    has_csv = csv_path is not None and os.path.exists(csv_path)
+    current = csv_provenance(csv_path) if has_csv else source
+    csv_unchanged = existing is not None and (
+        not has_csv
+        or (source is not None and source.get("blake2b") == current["blake2b"])  # only touched
+        or (source is None and csv_in_sync(path, csv_path, metadata))
+    )
+    if csv_unchanged:
+        df = existing
+    else:
+        df = enrich(pd.read_csv(csv_path, dtype=str))
+        if existing is not None and len(appended):
+            keys = natural_key(existing)
+            only_appended = existing[keys.isin(appended) & ~keys.isin(natural_key(df))]
+            df = compact_dtypes(pd.concat([df, only_appended], ignore_index=True))
+            df = df.sort_values("date", kind="stable", ignore_index=True)
+    write_catalog(df, path, current, appended)
+    return df
+
+
+def load_catalog(csv_path=DEFAULT_CSV_PATH, columns=None):
+    """Збагачений каталог: з Parquet, якщо він актуальний, інакше оновлений з CSV (з перезаписом Parquet)."""
+    path = catalog_path_for(csv_path)
+    if catalog_is_fresh(path, csv_path):
+        return read_catalog(path, columns)
+    if pq is None:
+        df = enrich(pd.read_csv(csv_path, dtype=str))
+        return df[list(columns)] if columns else df
+    try:
+        with file_lock(path):
+            # Another session may have refreshed it while we waited for the lock
+            if not catalog_is_fresh(path, csv_path):
+                sync_catalog(path, csv_path)
+    except OSError:
+        return enrich(pd.read_csv(csv_path, dtype=str))
+    return read_catalog(path, columns)
+
+
+def natural_key(df):
+    # Hash index over NATURAL_KEY; values are normalized the way addColumns leaves them
+    # (coord upper-cased, missing values as empty strings), so raw and enriched rows match
+    key = pd.DataFrame({
+        col: df[col].fillna("").astype(str).str.strip() for col in NATURAL_KEY
+    })
+    key["coord"] = key["coord"].str.upper().replace("NAN", "")
+    return pd.Index(pd.util.hash_pandas_object(key, index=False).to_numpy())
+
+
+def append_catalog(df, path=DEFAULT_CATALOG_PATH, csv_path=None):
+    """Додає нові події до каталогу без дублікатів; addColumns лише для нових рядків.
+
+    Каталог спершу будується з csv_path чи синхронізується з ним, якщо CSV змінився.
+    Повертає (кількість доданих, кількість пропущених дублікатів).
+    """
+    if pq is None:
+        raise RuntimeError("Для каталогу потрібен pyarrow")
+    # Read-modify-write of the catalog and its aggregates under one lock
+    with file_lock(path):
+        has_csv = csv_path is not None and os.path.exists(csv_path)
+        if (os.path.exists(path) or has_csv) and not catalog_is_fresh(path, csv_path):
+            sync_catalog(path, csv_path)
+        return merge_into_catalog(df, path)
+
+
+def merge_into_catalog(df, path):
+    # append_catalog body; the caller holds file_lock(path)
+    existing = read_catalog(path) if os.path.exists(path) else None
+    keys = natural_key(df)
+    is_new = ~keys.duplicated()
+    appended = pd.Index([], dtype="uint64")
+    if existing is not None:
+        is_new &= ~keys.isin(natural_key(existing))
+        appended = appended_keys(path)
+
+    added = df[is_new].copy()
+    if added.attrs.get("parser_version") != PARSER_VERSION:
+        added = addColumns(added)
+    # Stored aggregates can be updated with the new rows only if they match the old catalog
+    rollups_fresh = existing is not None and rollups_are_fresh(rollups_path_for(path), path)
+    merged = added if existing is None else compact_dtypes(pd.concat([existing, added], ignore_index=True))
+    # Date-sorted layout keeps range reads cheap
+    merged = merged.sort_values("date", kind="stable", ignore_index=True)
+    write_catalog(merged, path, None if existing is None else catalog_source(path), appended.append(keys[is_new]))
+    update_rollups(added, path, None if rollups_fresh else merged)
+    return int(is_new.sum()), int(len(df) - is_new.sum())
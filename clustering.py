@@ -0,0 +1,420 @@
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.metrics import silhouette_samples
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import KMeans, DBSCAN, Birch, MiniBatchKMeans
+from catalog import iter_catalog
+from function import LRUCache, atomic_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Fitted runs, keyed by ClusterRun.key: (dataset fingerprint, features, algorithm,
+# hyperparameters) plus the initial centroids of a warm-started KMeans
+MODEL_CACHE = LRUCache(maxsize=64)
+# Most values one sweep fits: a whole sweep stays in MODEL_CACHE next to other runs
+SWEEP_MAX_POINTS = MODEL_CACHE.maxsize // 2
+# Fitted scaler and the scaled matrix for each (dataset fingerprint, features)
+SCALER_CACHE = LRUCache(maxsize=8)
+# Fitted NearestNeighbors and each point's distances to its KDIST_NEIGHBORS nearest points,
+# for each (dataset fingerprint, features); k-distance curves are cut from them
+NEIGHBOR_CACHE = LRUCache(maxsize=4)
+KDIST_CACHE = LRUCache(maxsize=16)
+# Upper bound of the min_samples input: larger values query the cached index again
+KDIST_NEIGHBORS = 20
+
+# Whole-catalog runs, see stream_clusters; each has its own labels file on disk
+STREAM_CACHE = LRUCache(maxsize=4)
+# Estimators with partial_fit, for the out-of-core mode
+STREAM_ALGOS = ("MiniBatchKMeans", "Birch")
+
+# Numeric code of the X-ray class, used as a feature
+CLASS_CODES = {"A": 0, "B": 1, "C": 2, "M": 3, "X": 4}
+
+# Swept hyperparameter of each algorithm
+SWEEP_PARAMS = {"KMeans": "k", "DBSCAN": "eps", "Birch": "threshold"}
+
+# Above this many rows the silhouette is estimated on a random sample (cost is O(n²))
+SILHOUETTE_MAX_ROWS = 5000
+
+
+def params_key(params):
+    return tuple(sorted(params.items()))
+
+
+def run_key(dataset_key, features, algo, params):
+    return dataset_key, tuple(features), algo, params_key(params)
+
+
+def count_clusters(labels):
+    # DBSCAN noise (-1) is not a cluster
+    unique = set(labels.tolist())
+    return len(unique) - (1 if -1 in unique else 0)
+
+
+class ClusterRun:
+    """Результат кластеризації: scaler, модель і мітки рядків матриці ознак."""
+
+    def __init__(self, dataset_key, features, algo, params, scaler, model, labels, warm_start=None):
+        self.dataset_key = dataset_key
+        self.features = tuple(features)
+        self.algo = algo
+        self.params = dict(params)
+        self.scaler = scaler
+        self.model = model
+        self.labels = labels
+        # (K of the run whose centroids initialised this KMeans fit, digest of the initial centroids)
+        self.warm_start = warm_start
+        # Silhouette reports by sample size, computed at most once per run
+        self.silhouettes = {}
+
+    @property
+    def key(self):
+        # Everything the labels depend on; a warm start adds its initial centroids
+        key = run_key(self.dataset_key, self.features, self.algo, self.params)
+        return key + (self.warm_start,) if self.warm_start else key
+
+    @property
+    def n_clusters(self):
+        return count_clusters(self.labels)
+
+    def silhouette(self, X_scaled, max_rows=SILHOUETTE_MAX_ROWS):
+        if max_rows not in self.silhouettes:
+            self.silhouettes[max_rows] = silhouette_report(X_scaled, self.labels, max_rows)
+        return self.silhouettes[max_rows]
+
+
+def silhouette_report(X_scaled, labels, max_rows=SILHOUETTE_MAX_ROWS, seed=0):
+    """Silhouette одним проходом: загальний, по кластерах і, для вибірки, 95% довірчий інтервал.
+
+    До max_rows рядків рахується точно; більше — на випадковій вибірці з max_rows рядків,
+    інтервал за нормальним наближенням по значеннях окремих точок. None, якщо міток < 2.
+    """
+    n = len(labels)
+    sampled = n > max_rows
+    idx = np.sort(np.random.default_rng(seed).choice(n, max_rows, replace=False)) if sampled else np.arange(n)
+    sample_labels = labels[idx]
+    if not 2 <= len(np.unique(sample_labels)) <= len(idx) - 1:
+        return None
+    values = silhouette_samples(X_scaled[idx], sample_labels)
+    score = float(values.mean())
+    ci = None
+    if sampled:
+        half = 1.96 * values.std(ddof=1) / np.sqrt(len(values))
+        ci = (score - float(half), score + float(half))
+    per_cluster = (
+        pd.DataFrame({"cluster": sample_labels.astype(str), "silhouette": values})
+        .groupby("cluster")["silhouette"].agg(["mean", "min", "count"])
+    )
+    return {"score": score, "ci": ci, "rows": len(idx), "total": n, "per_cluster": per_cluster}
+
+
+def scaled_features(X, dataset_key, features):
+    """(scaler, X_scaled) — StandardScaler навчається один раз на набір даних і ознаки."""
+    key = (dataset_key, tuple(features))
+    cached = SCALER_CACHE.get(key)
+    if cached is None:
+        X = np.asarray(X, dtype=float)
+        scaler = StandardScaler().fit(X)
+        cached = (scaler, scaler.transform(X))
+        SCALER_CACHE.put(key, cached)
+    return cached
+
+
+def make_model(algo, params, init=None):
+    if algo == "KMeans":
+        if init is not None:
+            return KMeans(n_clusters=int(params["k"]), init=init, n_init=1, random_state=42)
+        return KMeans(n_clusters=int(params["k"]), random_state=42, n_init="auto")
+    if algo == "DBSCAN":
+        return DBSCAN(eps=float(params["eps"]), min_samples=int(params["min_samples"]))
+    if algo == "Birch":
+        return Birch(n_clusters=int(params["k"]), threshold=float(params["threshold"]))
+    raise ValueError(f"Невідомий алгоритм: {algo}")
+
+
+def neighbor_index(X_scaled, dataset_key, features):
+    """(NearestNeighbors, відстані до KDIST_NEIGHBORS сусідів) — один пошук на набір даних і ознаки."""
+    key = (dataset_key, tuple(features))
+    cached = NEIGHBOR_CACHE.get(key)
+    if cached is None:
+        nn = NearestNeighbors().fit(X_scaled)
+        distances, _ = nn.kneighbors(X_scaled, min(KDIST_NEIGHBORS, len(X_scaled)))
+        cached = (nn, distances)
+        NEIGHBOR_CACHE.put(key, cached)
+    return cached
+
+
+def k_distances(X_scaled, dataset_key, features, min_samples):
+    # Sorted distance of every point to its min_samples-th neighbour (itself included):
+    # points at or below eps are DBSCAN core points, the knee of the curve is the usual eps
+    key = (dataset_key, tuple(features), int(min_samples))
+    curve = KDIST_CACHE.get(key)
+    if curve is None:
+        nn, distances = neighbor_index(X_scaled, dataset_key, features)
+        k = min(int(min_samples), len(X_scaled))
+        if k > distances.shape[1]:
+            distances, _ = nn.kneighbors(X_scaled, k)
+        curve = np.sort(distances[:, k - 1])
+        KDIST_CACHE.put(key, curve)
+    return curve
+
+
+def warm_start_centers(run, scaler, X_scaled, k):
+    # Centroids of an earlier run, mapped through the new scaler (they are stored in the
+    # old one's units). Extra centroids for a larger K are seeded k-means++ style around
+    # the ones already chosen; for a smaller K the most populated clusters are kept.
+    centers = scaler.transform(run.scaler.inverse_transform(run.model.cluster_centers_))
+    if len(centers) > k:
+        sizes = np.bincount(run.labels, minlength=len(centers))
+        return centers[np.sort(np.argsort(-sizes, kind="stable")[:k])]
+    rng = np.random.default_rng(42)
+    dist = ((X_scaled[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    extra = []
+    while len(centers) + len(extra) < k:
+        i = int(rng.choice(len(X_scaled), p=dist / dist.sum())) if dist.sum() > 0 else 0
+        extra.append(X_scaled[i])
+        dist = np.minimum(dist, ((X_scaled - X_scaled[i]) ** 2).sum(axis=1))
+    return np.vstack([centers] + extra) if extra else centers
+
+
+def centers_digest(centers):
+    return hashlib.blake2b(np.ascontiguousarray(centers, dtype=float).tobytes(), digest_size=8).hexdigest()
+
+
+def cached_run(key):
+    # Cached run with these parameters: the cold one, else the latest warm-started one
+    # (its ClusterRun.key is key plus the initial centroids)
+    if key in MODEL_CACHE:
+        return MODEL_CACHE.get(key)
+    for run in reversed(MODEL_CACHE.values()):
+        if run.key[:len(key)] == key:
+            return MODEL_CACHE.get(run.key)
+    return None
+
+
+def fit_clusters(X, dataset_key, features, algo, params, previous=None):
+    """Кластеризація з кешем: повертає (ClusterRun, чи взято з кешу).
+
+    Спершу шукається вже навчений запуск з тими самими параметрами — холодний чи з теплим
+    стартом. Лише якщо його немає, KMeans стартує з центроїдів previous (попереднього
+    запуску сесії); стартові центроїди входять у ключ кешу.
+    """
+    key = run_key(dataset_key, features, algo, params)
+    if previous is not None and previous.key[:len(key)] == key:
+        return previous, True
+    run = cached_run(key)
+    if run is not None:
+        return run, True
+    scaler, X_scaled = scaled_features(X, dataset_key, features)
+    init, warm_start = None, None
+    if (algo == "KMeans" and previous is not None and previous.algo == "KMeans"
+            and previous.features == tuple(features) and len(X_scaled) >= int(params["k"])):
+        init = warm_start_centers(previous, scaler, X_scaled, int(params["k"]))
+        warm_start = (int(previous.params["k"]), centers_digest(init))
+        key = key + (warm_start,)
+
+    model = make_model(algo, params, init)
+    labels = model.fit_predict(X_scaled)
+    run = ClusterRun(dataset_key, features, algo, params, scaler, model, labels, warm_start)
+    MODEL_CACHE.put(key, run)
+    return run, False
+
+
+def fit_one(algo, params, X_scaled, max_rows=SILHOUETTE_MAX_ROWS):
+    # One sweep point: (model, labels, silhouette report); runs in a worker process
+    model = make_model(algo, params)
+    labels = model.fit_predict(X_scaled)
+    sil = silhouette_report(X_scaled, labels, max_rows) if count_clusters(labels) > 1 else None
+    return model, labels, sil
+
+
+# Feature matrix of the sweep, set once per worker process
+worker_matrix = None
+
+
+def init_sweep_worker(X_scaled):
+    global worker_matrix
+    worker_matrix = X_scaled
+
+
+def fit_sweep_point(algo, params, max_rows):
+    # fit_one on the worker's copy of the matrix; only the parameters travel with each task
+    return fit_one(algo, params, worker_matrix, max_rows)
+
+
+def sweep(X, dataset_key, features, algo, params, values, max_rows=SILHOUETTE_MAX_ROWS, workers=None):
+    """Перебір значень параметра SWEEP_PARAMS[algo]: (таблиця кривих, список ClusterRun).
+
+    Моделі, які вже є в MODEL_CACHE, не перенавчаються — розширений діапазон дорахує
+    лише нові точки. Решта навчається паралельно в процесах; матриця передається кожному
+    процесу один раз. Перебір завжди навчає з нуля, тож ділить ключі лише з холодними
+    запусками fit_clusters (ключ запуску з теплим стартом містить стартові центроїди).
+    """
+    if len(values) > SWEEP_MAX_POINTS:
+        raise ValueError(f"Забагато значень для перебору: {len(values)} > {SWEEP_MAX_POINTS}")
+    param = SWEEP_PARAMS[algo]
+    scaler, X_scaled = scaled_features(X, dataset_key, features)
+    grid = [dict(params, **{param: value}) for value in values]
+    runs = [MODEL_CACHE.get(run_key(dataset_key, features, algo, p)) for p in grid]
+    cached = [run is not None for run in runs]
+    todo = [p for p, run in zip(grid, runs) if run is None]
+
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    if workers <= 1:
+        fitted = [fit_one(algo, p, X_scaled, max_rows) for p in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_sweep_worker, initargs=(X_scaled,)) as pool:
+            n = len(todo)
+            fitted = list(pool.map(fit_sweep_point, [algo] * n, todo, [max_rows] * n))
+    fitted = iter(fitted)
+
+    rows = []
+    for i, p in enumerate(grid):
+        if runs[i] is None:
+            model, labels, sil = next(fitted)
+            runs[i] = ClusterRun(dataset_key, features, algo, p, scaler, model, labels)
+            runs[i].silhouettes[max_rows] = sil
+            MODEL_CACHE.put(run_key(dataset_key, features, algo, p), runs[i])
+        run = runs[i]
+        sil = run.silhouette(X_scaled, max_rows) if run.n_clusters > 1 else None
+        rows.append({
+            param: p[param],
+            "n_clusters": run.n_clusters,
+            "inertia": getattr(run.model, "inertia_", np.nan),
+            "silhouette": sil["score"] if sil else np.nan,
+            "cached": cached[i],
+        })
+    return pd.DataFrame(rows), runs
+
+
+def feature_frame(chunk, features):
+    # Catalog rows -> rows with every feature present, class letter as its numeric code
+    chunk = chunk.assign(x_ray_class_num=chunk["x_ray_class"].map(CLASS_CODES).astype(float))
+    return chunk.dropna(subset=features)
+
+
+def make_stream_model(algo, params):
+    if algo == "MiniBatchKMeans":
+        return MiniBatchKMeans(n_clusters=int(params["k"]), random_state=42, n_init=3)
+    if algo == "Birch":
+        return Birch(n_clusters=int(params["k"]), threshold=float(params["threshold"]))
+    raise ValueError(f"Алгоритм без partial_fit: {algo}")
+
+
+def stream_labels_path(path, key):
+    # Labels file of one stream_clusters cache key, next to the catalog
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+    return f"{os.path.splitext(path)[0]}.clusters-{digest}.parquet"
+
+
+def remove_stale_labels(path):
+    # Labels files of results no longer in STREAM_CACHE
+    kept = {result["labels_path"] for result in STREAM_CACHE.values()}
+    for labels_path in glob.glob(glob.escape(os.path.splitext(path)[0]) + ".clusters-*.parquet"):
+        if labels_path not in kept:
+            try:
+                os.remove(labels_path)
+            except OSError:
+                pass
+
+
+def stream_clusters(path, dataset_key, features, algo, params, chunk_rows=50_000,
+                    sample_rows=20_000, max_rows=SILHOUETTE_MAX_ROWS):
+    """Кластеризація всього каталогу блоками (out-of-core), три проходи по Parquet:
+
+    1. StandardScaler.partial_fit; 2. partial_fit моделі; 3. мітки блок за блоком —
+    у файл *.clusters-<ключ>.parquet (row, date, lat, cluster), у підсумки по кластерах і у
+    випадкову вибірку для графіка та silhouette. Пам'ять залежить від chunk_rows.
+    Файл свій для кожного ключу кешу; файли результатів, витіснених з STREAM_CACHE, видаляються.
+    """
+    key = (dataset_key, tuple(features), algo, params_key(params), chunk_rows, sample_rows, max_rows)
+    result = STREAM_CACHE.get(key)
+    # Another session may have removed the file before this result was cached
+    if result is not None and os.path.exists(result["labels_path"]):
+        return result
+    columns = ["date", "x_ray_class", "lat"] + [f for f in features if f not in ("x_ray_class_num", "lat")]
+
+    def chunks():
+        for chunk in iter_catalog(path, columns, chunk_rows):
+            yield feature_frame(chunk, features)
+
+    scaler, rows = StandardScaler(), 0
+    for data in chunks():
+        if len(data):
+            scaler.partial_fit(data[features].to_numpy(dtype=float))
+            rows += len(data)
+    if rows < int(params["k"]):
+        raise ValueError(f"Замало рядків з усіма ознаками: {rows}")
+
+    model = make_stream_model(algo, params)
+    for data in chunks():
+        if len(data):
+            model.partial_fit(scaler.transform(data[features].to_numpy(dtype=float)))
+
+    labels_path = stream_labels_path(path, key)
+    rng = np.random.default_rng(0)
+    rate = min(1.0, sample_rows / rows)
+    count = total = squares = None
+    samples, writer, offset = [], None, 0
+    with atomic_path(labels_path) as tmp_path:
+        try:
+            for chunk in iter_catalog(path, columns, chunk_rows):
+                data = feature_frame(chunk, features)
+                data.index += offset  # номер рядка в каталозі
+                offset += len(chunk)
+                if not len(data):
+                    continue
+                labels = model.predict(scaler.transform(data[features].to_numpy(dtype=float))).astype(np.int32)
+                data = data.assign(cluster=labels)
+
+                table = pa.Table.from_pandas(pd.DataFrame({
+                    "row": data.index.to_numpy(dtype=np.int64),
+                    "date": data["date"].to_numpy(),
+                    "lat": data["lat"].to_numpy(),
+                    "cluster": labels,
+                }), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+
+                grouped = data.groupby("cluster")[features]
+                parts = grouped.count(), grouped.sum(), (data[features] ** 2).groupby(data["cluster"]).sum()
+                if count is None:
+                    count, total, squares = parts
+                else:
+                    count, total, squares = (a.add(b, fill_value=0) for a, b in zip((count, total, squares), parts))
+                samples.append(data[rng.random(len(data)) < rate])
+        finally:
+            if writer is not None:
+                writer.close()
+        # The catalog can be replaced between passes (append_catalog)
+        if writer is None:
+            raise ValueError("Каталог змінився під час кластеризації: немає рядків з усіма ознаками")
+
+    mean = total / count
+    std = np.sqrt(((squares - total ** 2 / count) / (count - 1)).clip(lower=0))
+    summary = pd.concat({"mean": mean, "std": std, "count": count.astype(int)}, axis=1).swaplevel(axis=1)
+    summary = summary[[(f, stat) for f in features for stat in ("mean", "std", "count")]]
+    summary.index = summary.index.astype(str)
+    sample = pd.concat(samples)
+    sample_labels = sample["cluster"].to_numpy()
+    sil = None
+    if count_clusters(sample_labels) > 1:
+        sil = silhouette_report(scaler.transform(sample[features].to_numpy(dtype=float)), sample_labels, max_rows)
+
+    result = {
+        "scaler": scaler, "model": model, "rows": rows, "summary": summary,
+        "sample": sample.assign(cluster=sample_labels.astype(str)), "silhouette": sil, "labels_path": labels_path,
+    }
+    STREAM_CACHE.put(key, result)
+    remove_stale_labels(path)
+    return result
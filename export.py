@@ -0,0 +1,73 @@
+from io import BytesIO
+from openpyxl import Workbook
+from function import LRUCache, frame_fingerprint
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Format -> (label, MIME type)
+EXPORT_FORMATS = {
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "text/csv"),
+    "parquet": ("Parquet", "application/octet-stream"),
+}
+
+# Built files, keyed by (dataset fingerprint, format)
+EXPORT_CACHE = LRUCache(maxsize=6)
+
+# Rows converted to Python values at a time by the streamed XLSX writer
+XLSX_CHUNK_ROWS = 10_000
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or HAS_PYARROW]
+
+
+def write_xlsx(df, output):
+    # Write-only openpyxl workbook: rows go straight to the file, so memory doesn't grow
+    # with the sheet; values are converted chunk by chunk, missing ones as empty cells
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([str(col) for col in df.columns])
+    for start in range(0, len(df), XLSX_CHUNK_ROWS):
+        chunk = df.iloc[start:start + XLSX_CHUNK_ROWS].astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(output)
+
+
+def write_csv(df, output):
+    df.to_csv(output, index=False, encoding="utf-8")
+
+
+def write_parquet(df, output):
+    df.to_parquet(output, index=False)
+
+
+WRITERS = {"xlsx": write_xlsx, "csv": write_csv, "parquet": write_parquet}
+
+
+def export_key(df, fmt, key=None):
+    return (key if key is not None else frame_fingerprint(df)), fmt
+
+
+def is_exported(df, fmt, key=None):
+    return export_key(df, fmt, key) in EXPORT_CACHE
+
+
+def export_bytes(df, fmt, key=None):
+    """Файл для завантаження; будується один раз на набір даних і формат.
+
+    key — відбиток даних, якщо DataFrame не має власного (frame_fingerprint).
+    """
+    cache_key = export_key(df, fmt, key)
+    data = EXPORT_CACHE.get(cache_key)
+    if data is None:
+        output = BytesIO()
+        WRITERS[fmt](df, output)
+        data = output.getvalue()
+        EXPORT_CACHE.put(cache_key, data)
+    return data
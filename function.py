@@ -1,10 +1,55 @@
+import os
 import re
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from PyPDF2 import PdfReader
 import numpy as np
 
-def hhmm_to_timedelta(col):
-    return pd.to_timedelta(col.str.extract(r'(\d{4})')[0].str[:2] + ":" + col.str.extract(r'(\d{4})')[0].str[2:] + ":00")
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Bump when addColumns output changes, so cached enriched frames are rebuilt
+PARSER_VERSION = 4
+
+def hhmm_to_minutes(col):
+    # HHMM strings -> (int64 minutes since midnight, mask of parsed values)
+    digits = col.str.extract(r'(\d{4})', expand=False)
+    valid = digits.notna().to_numpy()
+    hhmm = digits.fillna('0').astype(np.int64).to_numpy()
+    return (hhmm // 100) * 60 + hhmm % 100, valid
+
+def minutes_to_timedelta(minutes, valid, index=None):
+    td = minutes.astype('timedelta64[m]').astype('timedelta64[ns]')
+    td[~valid] = np.timedelta64('NaT')
+    return pd.Series(td, index=index)
+
+def minutes_to_hhmm(minutes, valid, index=None):
+    # Batched f"{h:02d}:{m:02d}" formatting, None where the value is missing
+    hours = pd.Series(minutes // 60, index=index).astype(str).str.zfill(2)
+    mins = pd.Series(minutes % 60, index=index).astype(str).str.zfill(2)
+    return (hours + ':' + mins).where(valid, None)
+
+IMPORTANCE_MAP = {
+    'S': 'Subflare (area < 2.1 deg²)',
+    '1': 'Importance 1 (2.1 < area < 5.1 deg²)',
+    '2': 'Importance 2 (5.2 < area < 12.4 deg²)',
+    '3': 'Importance 3 (12.5 < area < 24.7 deg²)',
+    '4': 'Importance 4 (area > 24.8 deg²)'
+}
+BRIGHTNESS_MAP = {
+    'N': 'Normal',
+    'F': 'Faint',
+    'B': 'Brilliant'
+}
 
 def parse_solar_coordinates(coord):
     # Regular expression to extract latitude, longitude, and Carrington longitude
@@ -59,25 +104,13 @@ def parse_flare_df(df):
         # Определе
         # Определение важности по площади, если есть информация о важности
         if importance_code in ['S', '1', '2', '3', '4']:
-            importance_map = {
-                'S': 'Subflare (area < 2.1 deg²)',
-                '1': 'Importance 1 (2.1 < area < 5.1 deg²)',
-                '2': 'Importance 2 (5.2 < area < 12.4 deg²)',
-                '3': 'Importance 3 (12.5 < area < 24.7 deg²)',
-                '4': 'Importance 4 (area > 24.8 deg²)'
-            }
-            importance_str = importance_map.get(importance_code, 'Unknown Importance')
+            importance_str = IMPORTANCE_MAP.get(importance_code, 'Unknown Importance')
         else:
             importance_str = 'No Importance Provided'
         
         # Яркость вспышки, если указана
         if brightness_code in ['N', 'F', 'B']:
-            brightness_map = {
-                'N': 'Normal',
-                'F': 'Faint',
-                'B': 'Brilliant'
-            }
-            brightness_str = brightness_map.get(brightness_code, 'Unknown Brightness')
+            brightness_str = BRIGHTNESS_MAP.get(brightness_code, 'Unknown Brightness')
         else:
             brightness_str = 'No Brightness Provided'
         
@@ -86,50 +119,361 @@ def parse_flare_df(df):
     else:
         return np.nan,np.nan, np.nan,np.nan
 
+def parse_solar_coordinates_column(coord):
+    # Columnar version of parse_solar_coordinates: one regex pass over the whole column
+    parts = coord.str.extract(r'^([NS])(\d+)([EW])(\d+)L(\d+)')
+    lat_degree = parts[1].astype(float)
+    lon_degree = parts[3].astype(float)
+
+    # Apply hemispheres (negative for South and West)
+    return pd.DataFrame({
+        'lat': lat_degree.where(parts[0] != 'S', -lat_degree),
+        'lon': lon_degree.where(parts[2] != 'W', -lon_degree),
+        'carrington_Lon': parts[4].astype(float),
+        'lat_hemisphere': parts[0],
+        'lon_hemisphere': parts[2],
+    }, index=coord.index)
+
+def parse_flare_column(xray):
+    # Columnar version of parse_flare_df, same rules applied to the whole column
+    xray = xray.str.replace("М", "M", regex=False).str.replace("Х", "X", regex=False)
+    # Importance and class swapped places (e.g. 1B/X2.6) -> X2.6/1B
+    xray = xray.str.replace(r'^([1234SF][^/]*)/([A-X]\d[^/]*)$', r'\2/\1', regex=True)
+
+    parts = xray.str.extract(r'^([A-X])[><]?(\d+(?:\.\d+)?)(?:/([1234SF])?(N|F|B)?)?')
+    matched = parts[0].notna()
+
+    importance = parts[2].map(IMPORTANCE_MAP).fillna('No Importance Provided')
+    brightness = parts[3].map(BRIGHTNESS_MAP).fillna('No Brightness Provided')
+    return pd.DataFrame({
+        'x_ray_class': parts[0],
+        'peak_flux': parts[1].astype(float),
+        'importance': importance.where(matched),
+        'brightness': brightness.where(matched),
+    }, index=xray.index)
+
 def addColumns(df):
     df['date'] = pd.to_datetime(df['ymd'], format='%Y%m%d')
     
-    # Convert to timedelta
-    df['toTime'] = hhmm_to_timedelta(df['to'])
-    df['teTime'] = hhmm_to_timedelta(df['te'])
-    df['tmTime'] = hhmm_to_timedelta(df['tm']).apply(
-        lambda x: f"{int(x.total_seconds() // 3600):02d}:{int((x.total_seconds() % 3600) // 60):02d}"
-        if pd.notnull(x) else None
-    )
+    # Parse HHMM once into integer minutes
+    to_min, to_valid = hhmm_to_minutes(df['to'])
+    te_min, te_valid = hhmm_to_minutes(df['te'])
+    tm_min, tm_valid = hhmm_to_minutes(df['tm'])
 
     # Adjust for midnight crossing
-    df['teTime'] = df.apply(lambda row: row['teTime'] + pd.Timedelta(hours=24) if row['teTime'] < row['toTime'] else row['teTime'], axis=1)
+    te_min = te_min + 24 * 60 * (to_valid & te_valid & (te_min < to_min))
 
     # Calculate duration
-    df['duration'] = df['teTime'] - df['toTime']
-
-    # Convert duration to total minutes (optional)
-    df['duration_minutes'] = df['duration'].dt.total_seconds() / 60
-
-    # Convert duration to HH:MM format (optional)
-    df['duration_hhmm'] = df['duration'].apply(
-        lambda x: f"{int(x.total_seconds() // 3600):02d}:{int((x.total_seconds() % 3600) // 60):02d}"
-        if pd.notnull(x) else None
-    )
-    df['toTime'] = df['toTime'].apply(
-        lambda x: f"{int(x.total_seconds() // 3600):02d}:{int((x.total_seconds() % 3600) // 60):02d}"
-        if pd.notnull(x) else None
-    )
-
-    df['teTime'] = df['teTime'].apply(
-        lambda x: f"{int(x.total_seconds() // 3600):02d}:{int((x.total_seconds() % 3600) // 60):02d}"
-        if pd.notnull(x) else None
-    )
+    dur_valid = to_valid & te_valid
+    dur_min = te_min - to_min
+
+    df['toTime'] = minutes_to_hhmm(to_min, to_valid, df.index)
+    df['teTime'] = minutes_to_hhmm(te_min, te_valid, df.index)
+    df['tmTime'] = minutes_to_hhmm(tm_min, tm_valid, df.index)
+    df['duration'] = minutes_to_timedelta(dur_min, dur_valid, df.index)
+    df['duration_minutes'] = np.where(dur_valid, dur_min, np.nan)
+    df['duration_hhmm'] = minutes_to_hhmm(dur_min, dur_valid, df.index)
+
+    # Typed times next to the display strings, so pages don't re-parse text
+    df['toTimedelta'] = minutes_to_timedelta(to_min, to_valid, df.index)
+    df['teTimedelta'] = minutes_to_timedelta(te_min, te_valid, df.index)
+    df['tmTimedelta'] = minutes_to_timedelta(tm_min, tm_valid, df.index)
+
     # Convert to uppercase
     df['coord'] = df['coord'].str.upper().astype(str)
-    df[['lat', 'lon', 'carrington_Lon', 'lat_hemisphere', 'lon_hemisphere']] = df['coord'].apply(
-        lambda x: pd.Series(parse_solar_coordinates(x))
-    )
+    df[['lat', 'lon', 'carrington_Lon', 'lat_hemisphere', 'lon_hemisphere']] = parse_solar_coordinates_column(df['coord'])
 
-    df[['x_ray_class', 'peak_flux', 'importance', 'brightness']] = df['xray/opt'].apply(
-        lambda x: pd.Series(parse_flare_df(x))
-    )
+    df[['x_ray_class', 'peak_flux', 'importance', 'brightness']] = parse_flare_column(df['xray/opt'])
     df['L'] = pd.to_numeric(df['L'], errors='coerce')
     df['isCMEFlare'] = ((df['CME'].str.strip().str.len()>4) & (~df["CME"].isna())).astype(int)
     df['isProtonFlare'] = ((~df["protons"].isna()) & (df['protons'].str.strip().str.len()>1)).astype(int)
+    df = compact_dtypes(df)
+    df.attrs['parser_version'] = PARSER_VERSION
+    return df
+
+
+# Compact dtypes of the enriched frame: labels as categoricals, whole-number degrees and
+# minutes as float32, flags as bool. peak_flux and L keep float64: decimal fractions such
+# as 2.6 become 2.5999999 in float32 and would show up so in hovers and exports
+COMPACT_SCHEMA = {
+    'x_ray_class': 'category',
+    'importance': 'category',
+    'brightness': 'category',
+    'lat_hemisphere': 'category',
+    'lon_hemisphere': 'category',
+    'cycle': 'category',
+    'lat': 'float32',
+    'lon': 'float32',
+    'carrington_Lon': 'float32',
+    'duration_minutes': 'float32',
+    'isCMEFlare': 'bool',
+    'isProtonFlare': 'bool',
+}
+# What addColumns stored before the compact schema, for the memory report
+WIDE_DTYPES = {'category': object, 'float32': 'float64', 'bool': 'int64'}
+
+def compact_dtypes(df):
+    # Casts the columns of COMPACT_SCHEMA in place; idempotent, so it is re-applied after
+    # pd.concat, which turns categoricals with different categories back into object
+    for col, dtype in COMPACT_SCHEMA.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        values = df[col]
+        if dtype == 'category' and values.dtype == object:
+            values = values.str.strip()
+        df[col] = values.astype(dtype)
+    return df
+
+def dataset_fingerprint(df):
+    # Content hash of a frame: column names + per-row hashes of the values
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x1f".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def frame_fingerprint(df):
+    # Fingerprint of a loaded frame, computed once and kept in df.attrs.
+    # Filtered subsets inherit attrs, so take it from the frame as loaded.
+    if 'fingerprint' not in df.attrs:
+        df.attrs['fingerprint'] = dataset_fingerprint(df)
+    return df.attrs['fingerprint']
+
+class LRUCache:
+    # Small bounded cache with hit/miss counters, shared by all pages of the process.
+    # Streamlit runs each session in its own thread, so every access takes the lock
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        # Membership test without touching the hit/miss counters
+        with self._lock:
+            return key in self._data
+
+    def values(self):
+        # Snapshot of the cached values; doesn't count as hits or change the LRU order
+        with self._lock:
+            return list(self._data.values())
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+# Memory reports, keyed by (frame fingerprint, columns)
+MEMORY_REPORT_CACHE = LRUCache(maxsize=8)
+
+def memory_report_key(df):
+    return frame_fingerprint(df), tuple(df.columns)
+
+def is_memory_reported(df):
+    return memory_report_key(df) in MEMORY_REPORT_CACHE
+
+def memory_report(df):
+    # Memory per column of the compact frame and of the same data in the old wide dtypes.
+    # The wide copy is as big as the old frame, so it is built once per dataset
+    key = memory_report_key(df)
+    report = MEMORY_REPORT_CACHE.get(key)
+    if report is not None:
+        return report
+    wide = df.astype({
+        col: WIDE_DTYPES[dtype] for col, dtype in COMPACT_SCHEMA.items()
+        if col in df.columns and df[col].dtype == dtype
+    })
+    report = pd.DataFrame({
+        'dtype_before': wide.dtypes.astype(str),
+        'before_kb': wide.memory_usage(index=False, deep=True) / 1024,
+        'dtype_after': df.dtypes.astype(str),
+        'after_kb': df.memory_usage(index=False, deep=True) / 1024,
+    })
+    report['saved_kb'] = report['before_kb'] - report['after_kb']
+    report = report.sort_values('saved_kb', ascending=False)
+    MEMORY_REPORT_CACHE.put(key, report)
+    return report
+
+@contextmanager
+def file_lock(path):
+    # Exclusive lock on path + ".lock" for read-modify-write of a data file; works between
+    # processes and between sessions of one server (each call opens its own handle)
+    with open(path + ".lock", "a+") as fh:
+        fh.seek(0)
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def atomic_path(path):
+    # Unique temporary file next to path, renamed over it when the block succeeds:
+    # readers never see a half-written file and concurrent writers don't share a temp name
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+ENRICH_CACHE = LRUCache(maxsize=4)
+
+def enrich(df):
+    # addColumns memoized by (raw frame fingerprint, parser version); the raw frame keeps
+    # its hash in attrs, so a rerun with the same frame doesn't hash it again.
+    # The returned frame is shared between pages and must not be modified in place.
+    if df.attrs.get('parser_version') == PARSER_VERSION:
+        return df
+    enriched = ENRICH_CACHE.get(enrich_key(df))
+    if enriched is None:
+        enriched = cache_enriched(df, addColumns(df.copy()))
+    return enriched
+
+def enrich_key(raw):
+    return frame_fingerprint(raw), PARSER_VERSION
+
+def cache_enriched(raw, enriched):
+    # Stores a frame enriched elsewhere (e.g. batch by batch) where enrich(raw) will find it
+    key = enrich_key(raw)
+    enriched.attrs['fingerprint'] = f"{key[0]}:v{PARSER_VERSION}"
+    ENRICH_CACHE.put(key, enriched)
+    return enriched
+
+# Default fixed-width layout of a bulletin line
+DEFAULT_COLUMN_SLICES = {
+    'ymd': (0, 9),
+    'to': (9, 15),
+    'tm': (15, 20),
+    'te': (20, 26),
+    'xray/opt': (26, 35),
+    'L': (35, 42),
+    'coord': (42, 53),
+    'AR': (53, 59),
+    'radio': (59, 65),
+    'mhr': (65, 72),
+    'dynamic': (72, 77),
+    'sweep': (77, 81),
+    'CME': (81, 100),
+    'xray-hard': (100, 124),
+    'protons': (124, None)
+}
+
+# Bulletin lines start with the event date YYYYMMDD
+DATE_LINE_PATTERN = re.compile(r"^(?P<y>\d{4})(?P<m>\d{2})(?P<d>\d{2})\s+")
+
+LINES_CACHE = LRUCache(maxsize=4)
+
+# Below this many pages per worker a process pool costs more than it saves
+MIN_PAGES_PER_WORKER = 16
+
+def page_lines(pages):
+    lines = []
+    for page in pages:
+        text = page.extract_text()
+        lines.extend(line for line in text.splitlines() if DATE_LINE_PATTERN.match(line))
+    return lines
+
+# PDF opened once per worker process by the pool initializer; tasks carry only page ranges
+worker_reader = None
+
+def init_pdf_worker(data):
+    global worker_reader
+    worker_reader = PdfReader(BytesIO(data))
+
+def extract_page_range(start, stop):
+    # Date-matched lines of pages [start, stop); runs in a worker process
+    return page_lines(worker_reader.pages[start:stop])
+
+def iter_line_batches(data, workers=None, batch_pages=8):
+    # (pages done, total pages, lines) per chunk of pages, in page order.
+    # Page ranges are split across a process pool; small files stay in this process.
+    reader = PdfReader(BytesIO(data))
+    n_pages = len(reader.pages)
+    workers = min(workers or os.cpu_count() or 1, n_pages // MIN_PAGES_PER_WORKER)
+    if workers <= 1:
+        for start in range(0, n_pages, batch_pages):
+            stop = min(start + batch_pages, n_pages)
+            yield stop, n_pages, page_lines(reader.pages[start:stop])
+        return
+
+    # A few chunks per worker to even out pages with different amounts of text
+    bounds = np.linspace(0, n_pages, workers * 4 + 1).astype(int).tolist()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_pdf_worker, initargs=(data,)) as pool:
+        chunks = pool.map(extract_page_range, bounds[:-1], bounds[1:])
+        for stop, lines in zip(bounds[1:], chunks):
+            yield stop, n_pages, lines
+
+def extract_lines(data, workers=None):
+    # All date-matched text lines of the PDF bytes, in page order
+    return [line for _, _, lines in iter_line_batches(data, workers) for line in lines]
+
+def lines_key(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def concat_batches(batches):
+    # The list is emptied, so callers don't keep the batches alive next to the result
+    df = compact_dtypes(pd.concat(batches, ignore_index=True))
+    batches.clear()
+    df.attrs['parser_version'] = PARSER_VERSION
     return df
+
+def slice_lines(lines, column_slices):
+    # Fixed-width columns of the bulletin -> raw DataFrame, sliced column by column
+    # on a (lines x chars) matrix; shorter lines are padded with NULs, which the
+    # numpy unicode dtype drops when the slice is viewed back as strings.
+    # That would also drop real NULs at the end of a field, so lines containing
+    # NUL (garbage from a broken PDF) are sliced per line, as str.slice does
+    arr = np.array(lines, dtype=str)
+    width = max(arr.dtype.itemsize // 4, 1)
+    chars = arr.view('U1').reshape(len(lines), width)
+    has_nul = np.fromiter(('\x00' in line for line in lines), dtype=bool, count=len(lines))
+    per_line = has_nul.any() or any(start < 0 or (end or 0) < 0 for start, end in column_slices.values())
+    by_line = pd.Series(lines, dtype=object) if per_line else None
+
+    columns = {}
+    for col, (start, end) in column_slices.items():
+        end = end if end else None
+        if start < 0 or (end is not None and end < 0):
+            # Negative offsets are relative to each line's length
+            columns[col] = by_line.str.slice(start, end).str.strip().to_numpy()
+            continue
+        stop = width if end is None else min(end, width)
+        if start >= stop:
+            columns[col] = np.full(len(lines), '', dtype=object)
+        else:
+            part = np.ascontiguousarray(chars[:, start:stop]).view(f'U{stop - start}').ravel()
+            columns[col] = np.char.strip(part).astype(object)
+        if has_nul.any():
+            columns[col][has_nul] = by_line[has_nul].str.slice(start, end).str.strip().to_numpy()
+    return pd.DataFrame(columns, columns=list(column_slices.keys()))
@@ -0,0 +1,126 @@
+"""Пакетна конвертація PDF-бюлетенів у єдиний каталог спалахів.
+
+    python ingest.py bulletins/ -o data/extracted_data.csv --workers 4
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from catalog import append_catalog, catalog_path_for, csv_provenance, natural_key, write_catalog
+from function import (
+    DEFAULT_COLUMN_SLICES, addColumns, atomic_path, concat_batches, extract_lines, file_lock, slice_lines,
+)
+
+
+def ingest_file(path, column_slices=DEFAULT_COLUMN_SLICES):
+    """Один PDF -> (звіт, збагачений DataFrame або None)."""
+    report = {"file": path, "rows": 0, "extract_s": 0.0, "enrich_s": 0.0, "error": None}
+    try:
+        start = time.perf_counter()
+        with open(path, "rb") as fh:
+            lines = extract_lines(fh.read(), workers=1)
+        report["extract_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = addColumns(slice_lines(lines, column_slices))
+        report["enrich_s"] = time.perf_counter() - start
+        report["rows"] = len(df)
+        return report, df
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+        return report, None
+
+
+def find_pdfs(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def ingest(files, workers=None):
+    """Обробка файлів паралельно (по процесу на файл); результати в порядку вхідного списку."""
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1:
+        results = [ingest_file(path) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(ingest_file, files))
+    return [report for report, _ in results], [df for _, df in results if df is not None and len(df)]
+
+
+def write_output(df, output):
+    # Overlapping bulletins repeat events: keep the first copy, as append_catalog does
+    df = df[~natural_key(df).duplicated()].reset_index(drop=True)
+    if output.endswith(".parquet"):
+        with file_lock(output):
+            write_catalog(df, output)
+        return [output]
+    path = catalog_path_for(output)
+    with file_lock(path):
+        with atomic_path(output) as tmp_path:
+            df.to_csv(tmp_path, index=False)
+        written = [output]
+        # Типізована копія поруч із CSV — сторінки читають її замість тексту
+        if write_catalog(df, path, csv_provenance(output)):
+            written.append(path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="PDF-файли або каталоги з ними")
+    parser.add_argument("-o", "--output", default="data/extracted_data.csv", help="CSV або .parquet")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="кількість процесів (типово — усі ядра)")
+    parser.add_argument("--cycle", help="номер сонячного циклу для стовпця cycle")
+    parser.add_argument("--append", action="store_true", help="додати нові події до наявного каталогу без дублікатів")
+    args = parser.parse_args(argv)
+
+    files = find_pdfs(args.inputs)
+    if not files:
+        print("PDF-файли не знайдено", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    reports, frames = ingest(files, args.workers)
+    for r in reports:
+        status = f"ERROR {r['error']}" if r["error"] else f"{r['rows']:>7} рядків"
+        print(f"{r['extract_s']:7.2f}s {r['enrich_s']:6.2f}s  {status}  {r['file']}")
+
+    failed = [r for r in reports if r["error"]]
+    if not frames:
+        print("Немає даних для запису", file=sys.stderr)
+        return 1
+
+    df = concat_batches(frames)
+    df = df.sort_values("date", kind="stable", ignore_index=True)
+    if args.cycle:
+        df["cycle"] = pd.Series(args.cycle, index=df.index, dtype="category")
+    if args.append:
+        if args.output.endswith(".parquet"):
+            written = [args.output]
+            added, skipped = append_catalog(df, args.output)
+        else:
+            written = [catalog_path_for(args.output)]
+            added, skipped = append_catalog(df, written[0], args.output)
+        print(f"Додано нових подій: {added}, пропущено дублікатів: {skipped}")
+    else:
+        written = write_output(df, args.output)
+
+    print(
+        f"{len(files) - len(failed)}/{len(files)} файлів, {len(df)} рядків за "
+        f"{time.perf_counter() - start:.1f}s -> {', '.join(written)}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class Timings:
+    """Час, кількість рядків і пік пам'яті етапів одного перезапуску сторінки.
+
+    Пік пам'яті міряється, лише якщо процес уже трасує виділення (PYTHONTRACEMALLOC=1
+    чи python -X tracemalloc): трасування спільне для всіх сесій, тож вмикається для
+    процесу, а не сторінкою. Повторні виклики етапу з тією ж назвою підсумовуються
+    (calls, seconds, rows); on_update(timings) викликається після кожного етапу.
+    """
+
+    def __init__(self, page, on_update=None):
+        self.page = page
+        # Process-wide: with several sessions open, peaks include their allocations too
+        self.memory = tracemalloc.is_tracing()
+        self.on_update = on_update
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.start = time.perf_counter()
+        self.end = self.start
+        self.records = {}
+        # Open stages: [traced bytes at entry, peak carried over resets by nested stages]
+        self.open = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        # The yielded dict lets the caller set rows once they are known
+        info = {"rows": rows}
+        self.record(name)  # listed in order of entry, outer stages before nested ones
+        frame = None
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in self.open:
+                outer[1] = max(outer[1], peak)
+            tracemalloc.reset_peak()
+            frame = [current, 0]
+            self.open.append(frame)
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            seconds = time.perf_counter() - start
+            peak_mb = None
+            if frame is not None:
+                self.open.remove(frame)
+                peak_mb = (max(frame[1], tracemalloc.get_traced_memory()[1]) - frame[0]) / 2**20
+            self.add(name, seconds, info["rows"], peak_mb)
+
+    def iterate(self, name, iterable):
+        # Times every next() of a lazy producer (e.g. PDF pages) as one accumulated stage
+        items = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+            yield item
+
+    def record(self, name):
+        return self.records.setdefault(name, {"stage": name, "calls": 0, "seconds": 0.0, "rows": None, "peak_mb": None})
+
+    def add(self, name, seconds, rows=None, peak_mb=None):
+        record = self.record(name)
+        record["calls"] += 1
+        record["seconds"] += seconds
+        if rows is not None:
+            record["rows"] = (record["rows"] or 0) + int(rows)
+        if peak_mb is not None:
+            record["peak_mb"] = max(record["peak_mb"] or 0.0, peak_mb)
+        self.end = time.perf_counter()
+        if self.on_update:
+            self.on_update(self)
+
+    @property
+    def total_seconds(self):
+        return self.end - self.start
+
+    def to_dict(self):
+        return {
+            "page": self.page,
+            "started": self.started,
+            "memory": self.memory,
+            "total_seconds": round(self.total_seconds, 4),
+            "stages": [
+                dict(record, seconds=round(record["seconds"], 4),
+                     peak_mb=None if record["peak_mb"] is None else round(record["peak_mb"], 2))
+                for record in self.records.values()
+            ],
+        }
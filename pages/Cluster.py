@@ -1,22 +1,19 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO
-
 
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import (
-    KMeans,
-    DBSCAN,
-    AgglomerativeClustering,
-    Birch,
-)
-from sklearn.metrics import silhouette_score
 
 import plotly.express as px
+from plots import k_distance_plot
 
-from function import addColumns  # ➡️ утиліти з Visualize
-import os
+from catalog import catalog_is_fresh, catalog_key, catalog_path_for, load_catalog, pq
+from clustering import (
+    CLASS_CODES, MODEL_CACHE, SILHOUETTE_MAX_ROWS, STREAM_ALGOS, SWEEP_MAX_POINTS, SWEEP_PARAMS,
+    fit_clusters, k_distances, params_key, scaled_features, stream_clusters, sweep,
+)
+from function import frame_fingerprint
+from session import load_enriched, show_cache_stats, show_download, show_memory_report, start_timings  # ➡️ утиліти з Visualize
 
 # ----------------------------------------------------------------------------
 # ⚙️ Конфігурація сторінки
@@ -24,20 +21,12 @@ import os
 st.set_page_config(page_title="Кластерний аналіз", layout="wide")
 
 st.title("🧩 Кластерний аналіз сонячних спалахів")
+timings = start_timings("Cluster")
 
 # ----------------------------------------------------------------------------
 # 1️⃣ Завантаження даних
 # ----------------------------------------------------------------------------
 
-def load_dataframe(src):
-    """Читання CSV / Excel чи UploadedFile у DataFrame (dtype=str)."""
-    if isinstance(src, str):
-        return pd.read_csv(src, dtype=str)
-    ext = os.path.splitext(src.name)[-1].lower()
-    if ext == ".xlsx":
-        return pd.read_excel(src, dtype=str)
-    return pd.read_csv(src, dtype=str)
-
 uploaded_file = st.file_uploader(
     "Завантажте файл Excel або CSV (повторне завантаження перезапише поточні дані)",
     type=["xlsx", "csv"],
@@ -45,25 +34,6 @@ uploaded_file = st.file_uploader(
 
 DEFAULT_FILE = "data/extracted_data.csv"
 
-if "df" not in st.session_state:
-    if uploaded_file:
-        st.session_state.df = load_dataframe(uploaded_file)
-    elif os.path.exists(DEFAULT_FILE):
-        st.session_state.df = load_dataframe(DEFAULT_FILE)
-    else:
-        st.warning("Спочатку завантажте вхідний файл.")
-        st.stop()
-
-if uploaded_file:
-    st.session_state.df = load_dataframe(uploaded_file)
-
-df_raw = st.session_state.df.copy()
-
-df = addColumns(df_raw)
-
-# ----------------------------------------------------------------------------
-# 2️⃣ Попередня обробка
-# ----------------------------------------------------------------------------
 req_cols = [
     "x_ray_class",
     "peak_flux",
@@ -73,22 +43,53 @@ req_cols = [
     "L",
     "date",
 ]
-missing = [c for c in req_cols if c not in df.columns]
-if missing:
-    st.error("Відсутні стовпці: " + ", ".join(missing))
-    st.stop()
 
-# Фільтруємо на M та X класи (топові спалахи)
-df = df[df["x_ray_class"].isin(["M", "X"])].copy()
+# Весь каталог (усі класи) кластеризується блоками, без завантаження в пам'ять
+stream_mode = st.sidebar.toggle("🗄️ Весь каталог (поблоково, всі класи)")
+
+if stream_mode:
+    catalog_path = catalog_path_for(DEFAULT_FILE)
+    if pq is None:
+        st.error("Для поблокового режиму потрібен pyarrow.")
+        st.stop()
+    if not catalog_is_fresh(catalog_path, DEFAULT_FILE):
+        if not os.path.exists(DEFAULT_FILE):
+            st.warning("Каталог ще не створено.")
+            st.stop()
+        with timings.stage("Перебудова каталогу"):
+            load_catalog(DEFAULT_FILE)  # перебудова Parquet-каталогу
+    dataset_key = catalog_key(catalog_path)
+else:
+    # З типізованого каталогу читаються лише потрібні ознаки
+    with timings.stage("Завантаження даних") as info:
+        df = load_enriched(uploaded_file, DEFAULT_FILE, columns=req_cols)
+        info["rows"] = None if df is None else len(df)
+    if df is None:
+        st.warning("Спочатку завантажте вхідний файл.")
+        st.stop()
+    show_cache_stats()
+    show_memory_report(df)
+    # Ключ кешу моделей — відбитки завантаженого набору, до фільтрації
+    dataset_key = frame_fingerprint(df)
+
+    # ------------------------------------------------------------------------
+    # 2️⃣ Попередня обробка
+    # ------------------------------------------------------------------------
+    missing = [c for c in req_cols if c not in df.columns]
+    if missing:
+        st.error("Відсутні стовпці: " + ", ".join(missing))
+        st.stop()
+
+    # Фільтруємо на M та X класи (топові спалахи)
+    df = df[df["x_ray_class"].isin(["M", "X"])].copy()
 
-# Типи даних
-num_cols = ["peak_flux", "lat", "lon", "duration_minutes", "L"]
-for c in num_cols:
-    df[c] = pd.to_numeric(df[c], errors="coerce")
+    # Типи даних
+    num_cols = ["peak_flux", "lat", "lon", "duration_minutes", "L"]
+    for c in num_cols:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
 
-df["date"] = pd.to_datetime(df["date"], errors="coerce")
-class_map = {"A": 0, "B": 1, "C": 2, "M": 3, "X": 4}
-df["x_ray_class_num"] = df["x_ray_class"].map(class_map)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["x_ray_class_num"] = df["x_ray_class"].map(CLASS_CODES).astype(float)
 
 # ----------------------------------------------------------------------------
 # 3️⃣ Sidebar – параметри кластеризації
@@ -112,7 +113,7 @@ with st.sidebar:
 
     algo = st.selectbox(
         "Алгоритм",
-        (
+        STREAM_ALGOS if stream_mode else (
             "KMeans",
             "DBSCAN",
             # "Agglomerative",
@@ -120,60 +121,213 @@ with st.sidebar:
         ),
     )
 
+    sweep_mode = False
+    if not stream_mode:
+        mode = st.radio("Режим", ("Один запуск", "Перебір параметрів"), horizontal=True)
+        sweep_mode = mode == "Перебір параметрів"
+
+    def float_range(label, lo, hi, default):
+        # Діапазон значень для перебору з кроком; не більше SWEEP_MAX_POINTS значень
+        start, stop = st.slider(label, lo, hi, default, 0.1)
+        step = st.number_input(f"Крок {label}", 0.01, 1.0, 0.1, 0.01)
+        min_step = np.ceil((stop - start) / (SWEEP_MAX_POINTS - 1) * 100) / 100
+        if step < min_step:
+            st.caption(f"Крок збільшено до {min_step:.2f}: не більше {SWEEP_MAX_POINTS} значень")
+            step = min_step
+        return np.round(np.arange(start, stop + step / 2, step), 3).tolist()
+
     # Динамічні параметри
-    if algo == "KMeans":
-        k = st.number_input("K (кластерів)", 2, 15, 3, 1)
+    sweep_values = []
+    if algo in ("KMeans", "MiniBatchKMeans"):
+        if sweep_mode:
+            k_from, k_to = st.slider("K (діапазон)", 2, 15, (2, 10))
+            sweep_values = list(range(k_from, k_to + 1))
+            params = {}
+        else:
+            k = st.number_input("K (кластерів)", 2, 15, 3, 1)
+            params = {"k": int(k)}
     # elif algo == "Agglomerative":
     #     k = st.number_input("Кластерів", 2, 15, 3, 1)
     #     linkage = st.selectbox("Linkage", ("ward", "complete", "average", "single"))
     elif algo == "Birch":
         k = st.number_input("Кластерів", 2, 15, 3, 1)
-        threshold = st.slider("threshold", 0.1, 3.0, 0.5, 0.1)
+        if sweep_mode:
+            sweep_values = float_range("threshold", 0.1, 3.0, (0.2, 1.5))
+            params = {"k": int(k)}
+        else:
+            threshold = st.slider("threshold", 0.1, 3.0, 0.5, 0.1)
+            params = {"k": int(k), "threshold": float(threshold)}
     else:  # DBSCAN
-        eps = st.slider("eps", 0.1, 3.0, 1.2, 0.1)
+        if sweep_mode:
+            sweep_values = float_range("eps", 0.1, 3.0, (0.3, 2.0))
+        else:
+            eps = st.slider("eps", 0.1, 3.0, 1.2, 0.1)
         min_samples = st.number_input("min_samples", 3, 20, 5, 1)
+        params = {"min_samples": int(min_samples)}
+        if not sweep_mode:
+            params["eps"] = float(eps)
+
+    chunk_rows = 0
+    if stream_mode:
+        chunk_rows = st.number_input("Рядків у блоці", 1000, 1_000_000, 50_000, 1000)
+
+    sil_max_rows = st.number_input(
+        "Silhouette: макс. рядків (більше — оцінка на вибірці)", 500, 100000, SILHOUETTE_MAX_ROWS, 500
+    )
 
     run_btn = st.button("🚀 Запустити")
 
-if not run_btn:
+# Результат лишається на екрані, доки не змінено налаштування (моделі в кеші)
+request = (
+    dataset_key, tuple(feature_cols), algo, params_key(params), tuple(sweep_values), int(chunk_rows), int(sil_max_rows)
+)
+if run_btn:
+    st.session_state.cluster_request = request
+if st.session_state.get("cluster_request") != request:
     st.info("Натисніть кнопку \"Запустити\" у боковій панелі.")
     st.stop()
 
+
+def show_silhouette(sil):
+    # Silhouette у боковій панелі; повертає текст для підсумку
+    if sil is None:
+        st.sidebar.warning("Silhouette: N/A (≤1 кластер)")
+        return None
+    sil_text = f"Silhouette: {sil['score']:.3f}"
+    if sil["ci"]:
+        sil_text += f" (95% ДІ {sil['ci'][0]:.3f}…{sil['ci'][1]:.3f}, вибірка {sil['rows']} з {sil['total']})"
+    st.sidebar.success(sil_text)
+    return sil_text
+
+
+def show_cluster_scatter(df_plot, params):
+    hover_data = [c for c in ["date", "x_ray_class", "peak_flux", "duration_minutes", "L"] if c in df_plot.columns]
+    fig = px.scatter(
+        df_plot,
+        x='date',
+        y='lat',
+        color="cluster",
+        hover_data=hover_data,
+        title=f"Метод - {algo} ({', '.join(f'{name}={value}' for name, value in params.items())})",
+    )
+    fig.add_hline(
+        y=0,
+        line_dash="dash",
+        line_color="gray",
+        annotation_text="Екватор",
+        annotation_position="top left"
+    )
+    fig.update_layout(height=500)
+    fig.update_traces(marker=dict(line=dict(width=1)))
+    fig.update_yaxes(title="Широта (°)", range=[-90, 90])
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def show_silhouette_breakdown(sil, sil_text):
+    if sil is not None:
+        st.markdown(sil_text)
+        st.dataframe(sil["per_cluster"].rename(columns={
+            "mean": "Silhouette (середній)", "min": "Silhouette (мін.)", "count": "Точок в оцінці",
+        }))
+
+
+# ----------------------------------------------------------------------------
+# Поблоковий режим: весь каталог, мітки пишуться у файл блок за блоком
+# ----------------------------------------------------------------------------
+if stream_mode:
+    with st.spinner("Кластеризація каталогу блоками…"):
+        try:
+            with timings.stage("Поблокова кластеризація") as info:
+                result = stream_clusters(
+                    catalog_path, dataset_key, feature_cols, algo, params, int(chunk_rows), max_rows=int(sil_max_rows)
+                )
+                info["rows"] = result["rows"]
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+    sil_text = show_silhouette(result["silhouette"])
+
+    st.subheader("📊")
+    st.caption(f"Рядків у кластеризації: {result['rows']} · на графіку випадкова вибірка: {len(result['sample'])}")
+    with timings.stage("Графік кластерів", rows=len(result["sample"])):
+        show_cluster_scatter(result["sample"], params)
+
+    st.subheader("📑 Статистика по кластерах")
+    st.markdown('Клас спалаху - "A": 0, "B": 1, "C": 2, "M": 3, "X": 4')
+    st.dataframe(result["summary"])
+    show_silhouette_breakdown(result["silhouette"], sil_text)
+
+    # Файл міток читається з диска лише на запит, як у show_download
+    labels_path = result["labels_path"]
+    if st.session_state.get("stream_labels") != labels_path:
+        if not st.button("📦 Підготувати мітки (Parquet)"):
+            st.stop()
+        st.session_state["stream_labels"] = labels_path
+    with open(labels_path, "rb") as fh:
+        st.download_button(
+            label="💾 Завантажити мітки (Parquet)",
+            data=fh.read(),
+            file_name=os.path.basename(labels_path),
+            mime="application/octet-stream",
+        )
+    st.stop()
+
 # ----------------------------------------------------------------------------
 # 4️⃣ Матриця ознак
 # ----------------------------------------------------------------------------
-df_clu = df.dropna(subset=feature_cols).copy()
+with timings.stage("dropna", rows=len(df)):
+    df_clu = df.dropna(subset=feature_cols).copy()
 if df_clu.empty:
     st.error("Недостатньо даних після видалення пропусків.")
     st.stop()
 
 X = df_clu[feature_cols]
-X_scaled = StandardScaler().fit_transform(X)
+with timings.stage("Масштабування", rows=len(X)):
+    _, X_scaled = scaled_features(X, dataset_key, feature_cols)
 
 # ----------------------------------------------------------------------------
 # 5️⃣ Кластеризація
 # ----------------------------------------------------------------------------
-if algo == "KMeans":
-    model = KMeans(n_clusters=int(k), random_state=42, n_init="auto")
-    labels = model.fit_predict(X_scaled)
-elif algo == "DBSCAN":
-    model = DBSCAN(eps=float(eps), min_samples=int(min_samples))
-    labels = model.fit_predict(X_scaled)
-# elif algo == "Agglomerative":
-#     model = AgglomerativeClustering(n_clusters=int(k), linkage=linkage)
-#     labels = model.fit_predict(X_scaled)
-else:  # Birch
-    model = Birch(n_clusters=int(k), threshold=threshold)
-    labels = model.fit_predict(X_scaled)
-
-# Silhouette (коли доречно)
-unique_lbls = set(labels)
-num_clusters = len(unique_lbls) - (1 if -1 in unique_lbls else 0)
-if num_clusters > 1:
-    sil = silhouette_score(X_scaled, labels)
-    st.sidebar.success(f"Silhouette: {sil:.3f}")
+# Scaler, модель і мітки кешуються за (набір даних, ознаки, алгоритм, параметри)
+if sweep_mode:
+    st.subheader("📈 Перебір параметрів")
+    param = SWEEP_PARAMS[algo]
+    with timings.stage("Перебір параметрів", rows=len(X)):
+        curves, runs = sweep(X, dataset_key, feature_cols, algo, params, sweep_values, int(sil_max_rows))
+    n_cached = int(curves["cached"].sum())
+    st.caption(f"Навчено моделей: {len(curves) - n_cached}, з кешу: {n_cached}")
+
+    # Активна точка кривих — за замовчуванням найкращий silhouette
+    best = curves["silhouette"].idxmax() if curves["silhouette"].notna().any() else 0
+    active = st.select_slider(f"Активний результат ({param})", options=sweep_values, value=sweep_values[best])
+    run = runs[sweep_values.index(active)]
+
+    curve_cols = [("silhouette", "Silhouette"), ("n_clusters", "Кількість кластерів")]
+    if algo == "KMeans":
+        curve_cols.insert(0, ("inertia", "Inertia (лікоть)"))
+    for col, (measure, title) in zip(st.columns(len(curve_cols)), curve_cols):
+        fig_curve = px.line(curves, x=param, y=measure, markers=True, title=title)
+        fig_curve.add_vline(x=active, line_dash="dot", line_color="red")
+        fig_curve.update_layout(height=300)
+        col.plotly_chart(fig_curve, use_container_width=True)
 else:
-    st.sidebar.warning("Silhouette: N/A (≤1 кластер)")
+    # KMeans стартує з центроїдів попереднього запуску цієї ж сесії
+    with timings.stage("Навчання моделі", rows=len(X)):
+        run, from_cache = fit_clusters(X, dataset_key, feature_cols, algo, params, st.session_state.get("kmeans_run"))
+    if from_cache:
+        st.sidebar.caption("♻️ Модель взято з кешу")
+    elif run.warm_start:
+        st.sidebar.caption(f"🔥 KMeans стартував з центроїдів запуску K={run.warm_start[0]}")
+if run.algo == "KMeans":
+    st.session_state.kmeans_run = run
+labels = run.labels
+stats = MODEL_CACHE.stats()
+st.sidebar.caption(f"Кеш моделей: {stats['size']}/{stats['maxsize']} · влучань {stats['hits']}")
+
+# Silhouette (коли доречно) — один раз на запуск, зберігається разом з мітками
+with timings.stage("Silhouette", rows=len(X)):
+    sil = run.silhouette(X_scaled, int(sil_max_rows)) if run.n_clusters > 1 else None
+sil_text = show_silhouette(sil)
 
 df_clu["cluster"] = labels.astype(str)
 
@@ -182,50 +336,32 @@ df_clu["cluster"] = labels.astype(str)
 # ----------------------------------------------------------------------------
 
 st.subheader("📊")
-fig = px.scatter(
-    df_clu,
-    x='date',
-    y='lat',
-    color="cluster",
-    hover_data=["date", "x_ray_class", "peak_flux", "duration_minutes", "L"],
-    title=f"Метод - {algo}",
-)
-fig.add_hline(
-    y=0,
-    line_dash="dash",
-    line_color="gray",
-    annotation_text="Екватор",
-    annotation_position="top left"
-)
-fig.update_layout(height=500)
-fig.update_traces(marker=dict(line=dict(width=1)))
-fig.update_yaxes(title="Широта (°)", range=[-90, 90])
-st.plotly_chart(fig, use_container_width=True)
+with timings.stage("Графік кластерів", rows=len(df_clu)):
+    show_cluster_scatter(df_clu, run.params)
+
+# k-distance графік допомагає вибрати eps для DBSCAN
+if algo == "DBSCAN":
+    with st.expander("📉 k-distance графік (вибір eps)"):
+        st.caption("Точки на лінії eps і нижче — core-точки; різкий злам кривої — типовий вибір eps.")
+        with timings.stage("k-distance графік", rows=len(X_scaled)):
+            st.plotly_chart(
+                k_distance_plot(k_distances(X_scaled, dataset_key, feature_cols, params["min_samples"]), run.params["eps"], params["min_samples"]),
+                use_container_width=True,
+            )
 
 
 # ----------------------------------------------------------------------------
 # 7️⃣ Підсумкова статистика
 # ----------------------------------------------------------------------------
 st.subheader("📑 Статистика по кластерах")
-summary = df_clu.groupby("cluster")[feature_cols].agg(["mean", "std", "count"])
+with timings.stage("Статистика по кластерах", rows=len(df_clu)):
+    summary = df_clu.groupby("cluster")[feature_cols].agg(["mean", "std", "count"])
 st.markdown('Клас спалаху - "A": 0, "B": 1, "C": 2, "M": 3, "X": 4')
 st.dataframe(summary)
-score = silhouette_score(X_scaled, df_clu["cluster"])
-st.markdown(f"Silhouette Score: {score:.3f}")
+show_silhouette_breakdown(sil, sil_text)
 
 # ----------------------------------------------------------------------------
 # 8️⃣ Завантаження результатів
 # ----------------------------------------------------------------------------
-@st.cache_data
-def df_to_excel(df_: pd.DataFrame) -> bytes:
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df_.to_excel(writer, index=False)
-    return output.getvalue()
-
-st.download_button(
-    label="💾 Завантажити Excel",
-    data=df_to_excel(df_clu),
-    file_name="clusters.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-)
\ No newline at end of file
+# Ключ файлу — ключ запуску: мітки визначаються даними, ознаками, параметрами й стартовими центроїдами
+show_download(df_clu, "clusters", key=("clusters",) + run.key)
\ No newline at end of file
@@ -1,28 +1,14 @@
-import re
 import pandas as pd
 import streamlit as st
-from PyPDF2 import PdfReader
-from io import BytesIO
-from function import addColumns
+from function import (
+    DEFAULT_COLUMN_SLICES, LINES_CACHE, addColumns, cache_enriched, concat_batches, enrich,
+    iter_line_batches, lines_key, slice_lines,
+)
+from catalog import DEFAULT_CATALOG_PATH, DEFAULT_CSV_PATH, append_catalog
+from session import set_session_df, show_download, show_memory_report, start_timings
 
 # --- Типові позиції зрізів ---
-default_column_slices = {
-    'ymd': (0, 9),
-    'to': (9, 15),
-    'tm': (15, 20),
-    'te': (20, 26),
-    'xray/opt': (26, 35),
-    'L': (35, 42),
-    'coord': (42, 53),
-    'AR': (53, 59),
-    'radio': (59, 65),
-    'mhr': (65, 72),
-    'dynamic': (72, 77),
-    'sweep': (77, 81),
-    'CME': (81, 100),
-    'xray-hard': (100, 124),
-    'protons': (124, None)
-}
+default_column_slices = DEFAULT_COLUMN_SLICES
 
 # --- Ініціалізація session state ---
 if "column_slices" not in st.session_state:
@@ -30,23 +16,48 @@ if "column_slices" not in st.session_state:
 if "selected_column" not in st.session_state:
     st.session_state.selected_column = list(default_column_slices.keys())[0]
 
+PREVIEW_ROWS = 200
+
 # --- Допоміжна функція: парсинг PDF у DataFrame ---
-def parse_pdf(uploaded_file):
-    reader = PdfReader(uploaded_file)
-    pattern = re.compile(r"^(?P<y>\d{4})(?P<m>\d{2})(?P<d>\d{2})\s+")
-    data_list = []
-
-    for page in reader.pages:
-        text = page.extract_text()
-        for line in text.splitlines():
-            if pattern.match(line):
-                row = []
-                for col, (start, end) in st.session_state.column_slices.items():
-                    value = line[start:end].strip() if end else line[start:].strip()
-                    row.append(value)
-                data_list.append(row)
-    df = pd.DataFrame(data_list, columns=list(st.session_state.column_slices.keys()))
-    return addColumns(df)
+def parse_pdf(data):
+    column_slices = st.session_state.column_slices
+    # Текст PDF кешується за хешем файлу — зміна зрізів лише перерізає рядки
+    key = lines_key(data)
+    lines = LINES_CACHE.get(key)
+    if lines is not None:
+        with timings.stage("slice_lines", rows=len(lines)):
+            raw = slice_lines(lines, column_slices)
+        with timings.stage("addColumns", rows=len(raw)):
+            return enrich(raw)
+
+    # Перше читання: посторінкова обробка з прогресом і попереднім переглядом
+    progress = st.progress(0.0, text="Читання PDF…")
+    preview = st.empty()
+    lines, batches, n_rows = [], [], 0
+    for done, total, batch_lines in timings.iterate("Читання PDF", iter_line_batches(data)):
+        lines.extend(batch_lines)
+        # Сторінки без рядків бюлетеня пропускаються
+        if batch_lines:
+            with timings.stage("slice_lines", rows=len(batch_lines)):
+                raw = slice_lines(batch_lines, column_slices)
+            with timings.stage("addColumns", rows=len(raw)):
+                batch = addColumns(raw)
+            batches.append(batch)
+            if n_rows < PREVIEW_ROWS:
+                preview.dataframe(pd.concat(batches).head(PREVIEW_ROWS))
+            n_rows += len(batch)
+        progress.progress(done / total, text=f"Сторінок: {done}/{total} · рядків: {n_rows}")
+    LINES_CACHE.put(key, lines)
+    progress.empty()
+    preview.empty()
+    if not batches:
+        return addColumns(slice_lines([], column_slices))
+    with timings.stage("Об'єднання блоків", rows=n_rows):
+        df = concat_batches(batches)
+    # Наступні перезапуски ріжуть рядки з LINES_CACHE і беруть цей DataFrame з кешу збагачення
+    with timings.stage("slice_lines", rows=len(lines)):
+        raw = slice_lines(lines, column_slices)
+    return cache_enriched(raw, df)
 
 # --- Бокова панель: редагування колонок ---
 def show_column_editor():
@@ -99,28 +110,29 @@ def show_column_editor():
 
 # --- Основний інтерфейс ---
 st.title("Обробка PDF з даними")
+timings = start_timings("FileProcessing")
 uploaded_file = st.file_uploader("Завантажте PDF-файл", type="pdf")
 
 if uploaded_file:
-    df = parse_pdf(uploaded_file)
+    df = parse_pdf(uploaded_file.getvalue())
+    # DataFrame вже збагачений, тож інші сторінки беруть його без повторного addColumns
+    set_session_df(df, uploaded_file.file_id)
+    show_memory_report(df)
 
     if st.toggle("⚙️ Показати налаштування зрізів", key="show_editor_toggle"):
         show_column_editor()
     st.success("Попередній перегляд оброблених даних:")
     st.dataframe(df)
-
-    st.session_state.df = df
     st.markdown("---")
 
-    def to_excel_bytes(dataframe):
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            dataframe.to_excel(writer, index=False)
-        return output.getvalue()
-
-    st.download_button(
-        label="📥 Завантажити Excel",
-        data=to_excel_bytes(df),
-        file_name="результат_обробки.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    # Файл формується лише на запит і кешується за відбитком даних
+    show_download(df, "результат_обробки")
+
+    # Об'єднання з основним каталогом: додаються лише нові події
+    if st.button("➕ Додати до основного каталогу"):
+        try:
+            with timings.stage("Додавання до каталогу", rows=len(df)):
+                added, skipped = append_catalog(df, DEFAULT_CATALOG_PATH, DEFAULT_CSV_PATH)
+            st.success(f"Додано нових подій: {added}, пропущено дублікатів: {skipped}")
+        except Exception as e:
+            st.error(f"Не вдалося оновити каталог: {e}")
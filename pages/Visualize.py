@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from function import addColumns
-import os
+from session import load_enriched, show_cache_stats, show_memory_report, start_timings
+from plots import DENSITY_CACHE, FIGURE_CACHE, WEBGL_THRESHOLD, density_grid, lat_density, lat_scatter, payload_kb
+from function import frame_fingerprint
+from rollups import FREQS, carrington_rotation, get_rollups
+from stats import CYCLE_STATS_CACHE, DATE_INDEX_CACHE, DateIndex, cycle_statistics, hemisphere_trends
 import numpy as np
 
 xray_class_colors = {
@@ -34,28 +37,85 @@ common_params = dict(
 if selected_size_field:
     common_params["size"] = selected_size_field
 
+# --- Режим відображення точкових графіків ---
+render_options = {
+    f"Авто (WebGL > {WEBGL_THRESHOLD} точок)": "auto",
+    "SVG": "svg",
+    "WebGL": "webgl",
+}
+render_label = st.sidebar.selectbox("Режим відображення", options=list(render_options.keys()))
+render_mode = render_options[render_label]
+max_points = None
+if st.sidebar.checkbox("Проріджувати точки", help="Не більше заданої кількості точок: першими беруться класи X і M, далі по точці з кожної ділянки графіка, решта — рівномірна вибірка; звуження діапазону дат показує більше деталей"):
+    max_points = int(st.sidebar.number_input("Макс. точок на графік", 500, 200000, 5000, 500))
+# Розмір JSON рахується серіалізацією всієї фігури — лише на запит
+show_payload = st.sidebar.checkbox("Показувати розмір даних графіків")
+
+
+# --- Діаграма-метелик: точки чи 2-D гістограма ---
+density_mode = st.sidebar.selectbox("Графіки широти", ["Точки", "Щільність (2-D гістограма)"]) != "Точки"
+density_params = None
+if density_mode:
+    weight_options = {"Кількість спалахів": None, "Peak Flux, Вт/м²": "peak_flux", "Duration": "duration_minutes"}
+    weight_label = st.sidebar.selectbox("Вага клітинки", options=list(weight_options.keys()))
+    time_bins = int(st.sidebar.number_input("Інтервалів за часом", 20, 2000, 200, 20))
+    lat_bins = int(st.sidebar.number_input("Інтервалів за широтою", 10, 180, 60, 10))
+    density_params = (time_bins, lat_bins, weight_options[weight_label], weight_label)
+
+# Усе, що змінює вигляд графіків широти — частина ключа кешу фігур
+view_key = (selected_size_field, render_mode, max_points, density_params)
+
+
+def cached_density_grid(df_subset, subset_key):
+    time_bins, lat_bins, weight, _ = density_params
+    key = (dataset_key, subset_key, time_bins, lat_bins, weight)
+    grid = DENSITY_CACHE.get(key)
+    if grid is None:
+        grid = density_grid(df_subset, time_bins, lat_bins, weight)
+        DENSITY_CACHE.put(key, grid)
+    return grid
+
+
+def lat_chart(df_subset, subset_key, title, hover_data, start=None, end=None, height=None):
+    if density_mode:
+        return lat_density(cached_density_grid(df_subset, subset_key), title, start, end, density_params[3], height)
+    return lat_scatter(df_subset, title, hover_data, common_params, render_mode=render_mode, max_points=max_points, height=height)
+
+
+def show_scatter(fig, shown, total):
+    st.plotly_chart(fig, use_container_width=True)
+    trace_type = fig.data[0].type if fig.data else "—"
+    counted = "Клітинок" if trace_type == "heatmap" else "Точок"
+    size = f" · ~{payload_kb(fig):.0f} KB" if show_payload else ""
+    st.caption(f"{counted}: {shown} з {total} · {trace_type}{size}")
+
 
 st.title("📊 Графіки сонячних спалахів")
+timings = start_timings("Visualize")
 
 # Завжди пропонуємо завантажити новий файл
 uploaded_file = st.file_uploader("Завантажте файл Excel або CSV (повторне завантаження перезапише поточні дані)", type=["xlsx", "csv"])
 
 # Завантаження дефолтного файлу, якщо користувач не завантажив свій
 DEFAULT_FILE_PATH = "data/extracted_data.csv"
-if "df" not in st.session_state and os.path.exists(DEFAULT_FILE_PATH):
-    try:
-        df = pd.read_csv(DEFAULT_FILE_PATH, dtype=str)
-        st.session_state.df = df
-    except Exception as e:
-        st.warning(f"Не вдалося завантажити файл за замовчуванням: {e}")
+df = None
+try:
+    with timings.stage("Завантаження даних") as info:
+        df = load_enriched(uploaded_file, DEFAULT_FILE_PATH)
+        info["rows"] = None if df is None else len(df)
+except Exception as e:
+    st.warning(f"Не вдалося завантажити файл: {e}")
 
 # Перевірка наявності даних
-if "df" not in st.session_state:
+if df is None:
     st.warning("Спочатку завантажте та обробіть PDF на головній сторінці або Excel/CSV-файл вище.")
     st.stop()
 
-df = st.session_state.df
-df = addColumns(df)
+# Збагачений DataFrame спільний для всіх сторінок — працюємо з неглибокою копією
+dataset_key = frame_fingerprint(df)
+df = df.copy(deep=False)
+show_cache_stats()
+show_memory_report(df)
 
 # Обробка дати
 if "date" in df.columns:
@@ -68,9 +128,16 @@ else:
     st.error("Стовпець 'date' не знайдено.")
     st.stop()
 
+# Індекс за датою будується один раз на набір даних
+date_index = DATE_INDEX_CACHE.get(dataset_key)
+if date_index is None:
+    with timings.stage("Індекс дат", rows=len(df)):
+        date_index = DateIndex(df)
+    DATE_INDEX_CACHE.put(dataset_key, date_index)
+
 # Слайдер для вибору діапазону дат
-min_date = df["date"].min().date()
-max_date = df["date"].max().date()
+min_date = pd.Timestamp(date_index.dates[0]).date()
+max_date = pd.Timestamp(date_index.dates[-1]).date()
 
 date_range = st.slider(
     "Оберіть діапазон дат",
@@ -80,21 +147,18 @@ date_range = st.slider(
     format="YYYY-MM-DD"
 )
 
-# Фільтрація за обраним діапазоном
-filtered_df = df[
-    (df["date"] >= pd.to_datetime(date_range[0])) &
-    (df["date"] <= pd.to_datetime(date_range[1]))
-]
+# Фільтрація за обраним діапазоном (бінарний пошук по відсортованих датах)
+with timings.stage("Вибір діапазону дат") as info:
+    filtered_df = date_index.select(*date_range)
+    info["rows"] = len(filtered_df)
 
 # Стовпчикова діаграма кількості спалахів
-count_by_group = (
-    filtered_df.groupby("date")
-    .size()
-    .reset_index(name="Кількість спалахів")
-)
+bar_freq = {"День": "D", "Місяць": "M"}[st.radio("Групування", ["День", "Місяць"], horizontal=True)]
+with timings.stage("Графік частоти"):
+    count_by_group = date_index.counts(*date_range, freq=bar_freq).rename(columns={"count": "Кількість спалахів"})
 
-fig_bar = px.bar(count_by_group, x="date", y="Кількість спалахів",
-                 title=f"Частота сонячних спалахів")
+    fig_bar = px.bar(count_by_group, x="date", y="Кількість спалахів",
+                     title=f"Частота сонячних спалахів")
 st.plotly_chart(fig_bar, use_container_width=True)
 
 # Обробка числових стовпців
@@ -104,68 +168,134 @@ for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
 # Точкова діаграма з екватором
-fig_scatter = px.scatter(
-    filtered_df,
-    x="date",
-    y="lat",
-    hover_data=["brightness", "importance"],
-    # labels={"group": "Дата", "lat": "Широта"},
-    title="Розподіл сонячних спалахів за широтою у часі",
-    **common_params
-)
-fig_scatter.add_hline(
-    y=0,
-    line_dash="dash",
-    line_color="gray",
-    annotation_text="Екватор",
-    annotation_position="top left"
-)
-fig_scatter.update_yaxes(title="Широта (°)", range=[-90, 90])
-fig_scatter.update_traces(marker=dict(line=dict(width=1)))
-st.plotly_chart(fig_scatter, use_container_width=True)
-
-# Графік 1: Усі спалахи з окремими лініями тренду для кожної півкулі
-df_clean = df.copy().dropna(subset=["date", "lat", "lat_hemisphere"])
-
-
-fig_all = px.scatter(
-    df_clean,
-    x="date",
-    y="lat",
-    hover_data=["date", "brightness", "importance"],
-    title=f"Широти всіх спалахів",
-    **common_params
-)
-
-fig_all.add_hline(
-    y=0,
-    line_dash="dash",
-    line_color="gray",
-    annotation_text="Екватор",
-    annotation_position="top left"
+# (у режимі щільності — зріз сітки всього набору за діапазоном дат)
+with timings.stage("Графік широти", rows=len(df) if density_mode else len(filtered_df)):
+    fig_scatter, shown, total = lat_chart(
+        df if density_mode else filtered_df,
+        "all",
+        "Розподіл сонячних спалахів за широтою у часі",
+        ["brightness", "importance"],
+        *date_range,
+    )
+show_scatter(fig_scatter, shown, total)
+
+# --- Тренди з матеріалізованих агрегатів (без перегляду таблиці подій) ---
+st.header("📈 Тренди")
+trend_metrics = {
+    "Частота спалахів": "flares",
+    "Кумулятивний піковий потік (Вт/м²)": "cumulative_flux",
+    "Частка спалахів з CME": "cme_fraction",
+    "Частка протонних спалахів": "proton_fraction",
+}
+col_freq, col_metric = st.columns(2)
+trend_freq = col_freq.selectbox("Агрегація", list(FREQS), format_func=FREQS.get, index=2)
+trend_label = col_metric.selectbox("Показник", list(trend_metrics))
+
+with timings.stage("Агрегати трендів"):
+    trend_df = get_rollups(df, dataset_key).series(trend_freq)
+range_start, range_end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+if trend_freq == "CR":
+    lo, hi = carrington_rotation(pd.Series([range_start, range_end]))
+    trend_df = trend_df[(trend_df["period"] >= lo) & (trend_df["period"] <= hi)]
+else:
+    trend_df = trend_df[(trend_df["period"] >= range_start.to_period(trend_freq).start_time) & (trend_df["period"] <= range_end)]
+
+fig_trend = px.line(
+    trend_df,
+    x="period",
+    y=trend_metrics[trend_label],
+    markers=trend_freq != "D",
+    labels={"period": FREQS[trend_freq], trend_metrics[trend_label]: trend_label},
+    title=f"{trend_label} — {FREQS[trend_freq].lower()}",
 )
+st.plotly_chart(fig_trend, use_container_width=True)
+
+
+# --- Побудова графіків одного циклу (результат кешується) ---
+def build_cycle_figures(df_cycle, cycle, trends):
+    figures = []
+
+    # Графік 1: Усі спалахи з окремими лініями тренду для кожної півкулі
+    df_cycle_clean = df_cycle.dropna(subset=["date", "lat", "lat_hemisphere"])
+
+    fig_all, shown, total = lat_chart(
+        df_cycle_clean,
+        (cycle, "all"),
+        f"Широти всіх спалахів у циклі {cycle}",
+        ["date", "brightness", "importance"],
+        height=500,
+    )
+
+    # Додаємо лінії тренду для кожної півкулі з формулами (коефіцієнти — з hemisphere_trends)
+    for _, trend in trends[trends["cycle"] == cycle].iterrows():
+        a, b = trend["slope"], trend["intercept"]
+        x_range = np.array([trend["x_min"], trend["x_max"]], dtype=float)
+        y_trend = a * x_range + b
+
+        # Рівняння у форматі: y = a·x + b
+        equation = f"y = {a:.2e}·x + {b:.2f}"
+
+        # Додаємо лінію на графік
+        fig_all.add_scatter(
+            x=pd.to_datetime(x_range),
+            y=y_trend,
+            mode="lines",
+            name=f"Тренд ({trend['lat_hemisphere']}): {equation}",
+            line=dict(width=2, dash="dot"),
+            opacity = 1
+        )
+    figures.append((fig_all, shown, total))
+
+    # Графік 2: Лише X та M класи
+    # Графік 3: Лише ті, що з CME
+    # Графік 4: Протонні спалахи
+    subsets = [
+        ("xm", df_cycle[df_cycle["x_ray_class"].isin(["X", "M"])],
+         f"Широти спалахів класів X і M у циклі {cycle}", ["brightness", "importance"]),
+        ("cme", df_cycle[df_cycle['isCMEFlare'] == 1],
+         f"Широти спалахів з CME у циклі {cycle}", ["brightness", "importance", "CME"]),
+        ("protons", df_cycle[df_cycle['isProtonFlare'] == 1],
+         f"Широти протонних спалахів у циклі {cycle}", ["brightness", "importance", "protons"]),
+    ]
+    for name, df_subset, title, hover_data in subsets:
+        if not df_subset.empty:
+            figures.append(lat_chart(df_subset, (cycle, name), title, hover_data, height=500))
+    return figures
 
-fig_all.update_layout(height=500)
-fig_all.update_yaxes(title="Широта (°)", range=[-90, 90])
-fig_all.update_traces(marker=dict(line=dict(width=1)))
 
 # --- Візуалізація по кожному циклу ---
 if "cycle" in df.columns:
     st.header("🔁 Графіки по кожному циклу")
 
-    df["cycle"] = df["cycle"].astype(str).str.strip()
-    cycles = df["cycle"].dropna().unique()
-
-    for cycle in sorted(cycles):
+    cycles = sorted(df["cycle"].dropna().unique())
+
+    # Статистика всіх циклів одним grouped-проходом, раз на набір даних
+    cycle_stats = CYCLE_STATS_CACHE.get(dataset_key)
+    if cycle_stats is None:
+        with timings.stage("Статистика циклів", rows=len(df)):
+            cycle_stats = cycle_statistics(df).set_index("cycle")
+        CYCLE_STATS_CACHE.put(dataset_key, cycle_stats)
+    st.dataframe(
+        cycle_stats.rename(columns={
+            "total": "Усього спалахів",
+            "cme": "З CME",
+            "cme_percent": "З CME, %",
+            "protons": "Протонних",
+            "proton_percent": "Протонних, %",
+        }).style.format("{:.1f}", subset=["З CME, %", "Протонних, %"]),
+        use_container_width=True,
+    )
+
+    # Будується лише обраний цикл, а не вся історія
+    cycle = st.radio("Цикл", cycles, index=len(cycles) - 1, horizontal=True)
+    if cycle is not None:
         st.subheader(f"☀️ Цикл {cycle}")
         df_cycle = df[df["cycle"] == cycle]
 
         # --- Загальна статистика по циклу ---
-        total_count = len(df_cycle)
-        cme_count = len(df_cycle[(df_cycle['CME'].str.strip().str.len()>4) & (~df_cycle["CME"].isna())])
-        proton_count = len(df_cycle[(~df_cycle["protons"].isna()) & (df_cycle['protons'].str.strip().str.len()>4)])
-        cme_percent = (cme_count / total_count * 100) if total_count > 0 else 0
-        proton_percent = (proton_count / total_count * 100) if total_count > 0 else 0
+        row = cycle_stats.loc[cycle]
+        total_count, cme_count, proton_count = int(row["total"]), int(row["cme"]), int(row["protons"])
+        cme_percent, proton_percent = row["cme_percent"], row["proton_percent"]
 
         st.markdown(
             f"""
@@ -176,134 +306,11 @@ if "cycle" in df.columns:
             """
         )
 
-        # Графік 1: Усі спалахи з окремими лініями тренду для кожної півкулі
-        df_cycle_clean = df_cycle.copy().dropna(subset=["date", "lat", "lat_hemisphere"])
-
-        fig_all = px.scatter(
-            df_cycle_clean,
-            x="date",
-            y="lat",
-            hover_data=["date", "brightness", "importance"],
-            title=f"Широти всіх спалахів у циклі {cycle}",
-            **common_params
-        )
-        fig_all.add_hline(
-            y=0,
-            line_dash="dash",
-            line_color="gray",
-            annotation_text="Екватор",
-            annotation_position="top left"
-        )
-        fig_all.update_layout(height=500)
-        fig_all.update_yaxes(title="Широта (°)", range=[-90, 90])
-        fig_all.update_traces(marker=dict(line=dict(width=1)))
-
-        # Додаємо лінії тренду для кожної півкулі з формулами
-        for hemisphere, group in df_cycle_clean.groupby("lat_hemisphere"):
-            group = group.sort_values("date")
-            if len(group) < 2:
-                continue
-
-            # Перетворюємо дату у числовий формат для поліноміальної апроксимації
-            x_numeric = pd.to_numeric(group["date"])
-            y = group["lat"]
-            coef = np.polyfit(x_numeric, y, 1)
-            trend_fn = np.poly1d(coef)
-            # Побудова лінії тренду
-            x_range = np.linspace(x_numeric.min(), x_numeric.max(), 100)
-            y_trend = trend_fn(x_range)
-
-            # Рівняння у форматі: y = a·x + b
-            a, b = coef
-            equation = f"y = {a:.2e}·x + {b:.2f}"
-
-            # Додаємо лінію на графік
-            fig_all.add_scatter(
-                x=pd.to_datetime(x_range),
-                y=y_trend,
-                mode="lines",
-                name=f"Тренд ({hemisphere}): {equation}",
-                line=dict(width=2, dash="dot"),
-                opacity = 1
-            )
-            fig_all.add_hline(
-                y=0,
-                line_dash="dash",
-                line_color="gray",
-                annotation_text="Екватор",
-                annotation_position="top left"
-            )
-        fig_all.update_layout(height=500)
-        fig_all.update_yaxes(title="Широта (°)", range=[-90, 90])
-        fig_all.update_traces(marker=dict(line=dict(width=1)))
-        st.plotly_chart(fig_all, use_container_width=True)
-
-
-        # Графік 2: Лише X та M класи
-        df_class_xm = df_cycle[df_cycle["x_ray_class"].isin(["X", "M"])]
-        if not df_class_xm.empty:
-            fig_xm = px.scatter(
-                df_class_xm,
-                x="date",
-                y="lat",
-                hover_data=["brightness", "importance"],
-                title=f"Широти спалахів класів X і M у циклі {cycle}",
-                **common_params
-            )
-            fig_xm.add_hline(
-                y=0,
-                line_dash="dash",
-                line_color="gray",
-                annotation_text="Екватор",
-                annotation_position="top left"
-            )
-            fig_xm.update_layout(height=500)
-            fig_xm.update_traces(marker=dict(line=dict(width=1)))
-            fig_xm.update_yaxes(title="Широта (°)", range=[-90, 90])
-            st.plotly_chart(fig_xm, use_container_width=True)
-
-        # Графік 3: Лише ті, що з CME
-        df_cme = df_cycle[df_cycle['isCMEFlare'] == 1]
-        if not df_cme.empty:
-            fig_cme = px.scatter(
-                df_cme,
-                x="date",
-                y="lat",
-                hover_data=["brightness", "importance", "CME"],
-                title=f"Широти спалахів з CME у циклі {cycle}",
-                **common_params
-            )
-            fig_cme.add_hline(
-                y=0,
-                line_dash="dash",
-                line_color="gray",
-                annotation_text="Екватор",
-                annotation_position="top left"
-            )
-            fig_cme.update_layout(height=500)
-            fig_cme.update_traces(marker=dict(line=dict(width=1)))
-            fig_cme.update_yaxes(title="Широта (°)", range=[-90, 90])
-            st.plotly_chart(fig_cme, use_container_width=True)
-
-        # Графік 4: Протонні спалахи
-        df_protons = df_cycle[df_cycle['isProtonFlare'] == 1]
-        if not df_protons.empty:
-            fig_protons = px.scatter(
-                df_protons,
-                x="date",
-                y="lat",
-                hover_data=["brightness", "importance", "protons"],
-                title=f"Широти протонних спалахів у циклі {cycle}",
-                **common_params
-            )
-            fig_protons.add_hline(
-                y=0,
-                line_dash="dash",
-                line_color="gray",
-                annotation_text="Екватор",
-                annotation_position="top left"
-            )
-            fig_protons.update_layout(height=500)
-            fig_protons.update_traces(marker=dict(line=dict(width=1)))
-            fig_protons.update_yaxes(title="Широта (°)", range=[-90, 90])
-            st.plotly_chart(fig_protons, use_container_width=True)
\ No newline at end of file
+        figure_key = (dataset_key, cycle, view_key)
+        figures = FIGURE_CACHE.get(figure_key)
+        if figures is None:
+            with timings.stage("Графіки циклу", rows=len(df_cycle)):
+                figures = build_cycle_figures(df_cycle, cycle, hemisphere_trends(df))
+            FIGURE_CACHE.put(figure_key, figures)
+        for fig, shown, total in figures:
+            show_scatter(fig, shown, total)
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from function import LRUCache
+from rollups import absolute_flux
+
+# Above this many points scatter plots are drawn with WebGL (scattergl) traces
+WEBGL_THRESHOLD = 1000
+# Classes decimation keeps first, and the share of the remaining budget for one-per-cell points
+KEEP_CLASSES = ("X", "M")
+CELL_SHARE = 0.5
+
+# Built figures, keyed by dataset fingerprint and everything that changes the drawing
+FIGURE_CACHE = LRUCache(maxsize=32)
+# 2-D histograms of the butterfly diagram, keyed by dataset, subset and bin resolution
+DENSITY_CACHE = LRUCache(maxsize=16)
+
+
+def decimate(df, max_points, x="date", y="lat", bins=100, keep_classes=KEEP_CLASSES, seed=0):
+    # Density-preserving thinning with a hard cap of max_points rows. The budget is filled
+    # by priority: X/M events (all of them, as many as fit), then one point per occupied
+    # (x, y) cell (sparse regions and outliers), then a uniform sample of the rest (relative
+    # densities stay the same). The two lower tiers share what X/M leave; unused share passes
+    # to the other. Fixed seed -> same points on every rerun.
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(seed)
+    keep = df["x_ray_class"].isin(keep_classes).to_numpy()
+    priority = rng.permutation(np.flatnonzero(keep))
+    rest = rng.permutation(np.flatnonzero(~keep))
+
+    xs = pd.to_numeric(df[x].iloc[rest]).to_numpy(dtype=float)
+    ys = pd.to_numeric(df[y].iloc[rest]).to_numpy(dtype=float)
+    xi = np.digitize(xs, np.linspace(np.nanmin(xs), np.nanmax(xs), bins)) if len(rest) else xs
+    yi = np.digitize(ys, np.linspace(-90, 90, bins))
+    first_in_cell = ~pd.Series(xi * (bins + 2) + yi).duplicated().to_numpy()
+
+    tiers = [priority, rest[first_in_cell], rest[~first_in_cell]]
+    takes = [min(len(priority), max_points)]
+    budget = max_points - takes[0]
+    takes.append(min(len(tiers[1]), int(budget * CELL_SHARE)))
+    takes.append(min(len(tiers[2]), budget - takes[1]))
+    takes[1] += min(len(tiers[1]) - takes[1], budget - takes[1] - takes[2])
+    return df.iloc[np.sort(np.concatenate([tier[:take] for tier, take in zip(tiers, takes)]))]
+
+
+def lat_scatter(df, title, hover_data, params, render_mode="auto", max_points=None, height=None):
+    """Широта спалахів у часі з екватором; повертає (figure, точок показано, точок усього)."""
+    total = len(df)
+    if max_points:
+        df = decimate(df, max_points)
+    if render_mode == "auto":
+        render_mode = "webgl" if len(df) > WEBGL_THRESHOLD else "svg"
+
+    fig = px.scatter(
+        df,
+        x="date",
+        y="lat",
+        hover_data=hover_data,
+        title=title,
+        render_mode=render_mode,
+        **params
+    )
+    fig.add_hline(
+        y=0,
+        line_dash="dash",
+        line_color="gray",
+        annotation_text="Екватор",
+        annotation_position="top left"
+    )
+    if height:
+        fig.update_layout(height=height)
+    fig.update_yaxes(title="Широта (°)", range=[-90, 90])
+    fig.update_traces(marker=dict(line=dict(width=1)))
+    return fig, len(df), total
+
+
+def density_grid(df, time_bins=200, lat_bins=60, weight=None):
+    # (date, lat) 2-D histogram over the whole frame: (time edges ns, lat edges, grid).
+    # peak_flux is weighted as absolute flux, so an X1 counts 10× an M1 rather than less than an M2
+    data = df.dropna(subset=["date", "lat"])
+    x = pd.to_numeric(data["date"]).to_numpy(dtype=float)
+    y = data["lat"].to_numpy(dtype=float)
+    if weight == "peak_flux":
+        w = absolute_flux(data).to_numpy()
+    else:
+        w = pd.to_numeric(data[weight], errors="coerce").fillna(0).to_numpy() if weight else None
+    x_edges = np.linspace(x.min(), x.max() + 1, time_bins + 1) if len(x) else np.array([0.0, 1.0])
+    lat_edges = np.linspace(-90, 90, lat_bins + 1)
+    grid, _, _ = np.histogram2d(x, y, bins=[x_edges, lat_edges], weights=w)
+    return x_edges, lat_edges, grid
+
+
+def lat_density(grid, title, start=None, end=None, z_label="Кількість", height=None):
+    """Щільність спалахів (дата × широта) як heatmap; повертає (figure, непорожніх клітинок, усього клітинок)."""
+    x_edges, lat_edges, counts = grid
+    # Діапазон дат — зріз стовпців уже порахованої сітки
+    lo = 0 if start is None else max(np.searchsorted(x_edges, pd.Timestamp(start).value, "right") - 1, 0)
+    n_bins = len(x_edges) - 1
+    hi = n_bins if end is None else min(np.searchsorted(x_edges, pd.Timestamp(end).value, "right"), n_bins)
+    counts = counts[lo:hi]
+    x_centers = (x_edges[lo:hi] + x_edges[lo + 1:hi + 1]) / 2
+    lat_centers = (lat_edges[:-1] + lat_edges[1:]) / 2
+
+    fig = go.Figure(go.Heatmap(
+        x=pd.to_datetime(x_centers),
+        y=lat_centers,
+        z=np.where(counts > 0, counts, np.nan).T,
+        colorscale="Inferno",
+        colorbar=dict(title=z_label),
+        hovertemplate="%{x|%Y-%m-%d}<br>%{y:.1f}°<br>" + z_label + ": %{z:.3g}<extra></extra>",
+    ))
+    fig.update_layout(title=title, xaxis_title="Дата")
+    fig.add_hline(
+        y=0,
+        line_dash="dash",
+        line_color="gray",
+        annotation_text="Екватор",
+        annotation_position="top left"
+    )
+    if height:
+        fig.update_layout(height=height)
+    fig.update_yaxes(title="Широта (°)", range=[-90, 90])
+    return fig, int((counts > 0).sum()), counts.size
+
+
+def k_distance_plot(distances, eps, min_samples, height=350):
+    """k-distance графік для вибору eps DBSCAN: злам кривої — типовий eps, точки під лінією eps — core-точки."""
+    fig = px.line(
+        pd.DataFrame({"point": np.arange(len(distances)), "distance": distances}),
+        x="point",
+        y="distance",
+    )
+    fig.add_hline(y=eps, line_dash="dash", line_color="red", annotation_text=f"eps = {eps}")
+    fig.update_layout(
+        height=height,
+        xaxis_title="Точки, впорядковані за відстанню",
+        yaxis_title=f"Відстань до {min_samples}-го сусіда",
+    )
+    return fig
+
+
+def payload_kb(fig):
+    # Size of the figure JSON that is sent to the browser; serializes the whole figure
+    return len(fig.to_json()) / 1024
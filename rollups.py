@@ -0,0 +1,161 @@
+import os
+import numpy as np
+import pandas as pd
+from function import LRUCache, atomic_path, file_lock
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Агрегати на рівні дня, місяця та оберту Каррінгтона
+FREQS = {"D": "День", "M": "Місяць", "CR": "Оборот Каррінгтона"}
+
+# Peak flux of a class letter, W/m²
+CLASS_FLUX = {"A": 1e-8, "B": 1e-7, "C": 1e-6, "M": 1e-5, "X": 1e-4}
+
+COUNT_COLUMNS = ["flares", "x_class", "m_class", "cme", "protons"]
+
+ROLLUP_CACHE = LRUCache(maxsize=4)
+
+
+def carrington_rotation(date, carrington_lon=None):
+    # Fractional Carrington rotation number of each date. With the flare's Carrington
+    # longitude the event is assigned to the rotation in which its region crossed the
+    # central meridian (the usual convention for active regions).
+    jd = pd.to_numeric(date).to_numpy(dtype=float) / 86400e9 + 2440587.5
+    rotation = 1690 + (jd - 2444235.34) / 27.2753
+    if carrington_lon is not None:
+        central_lon = 360 * (1 - rotation % 1)
+        offset = ((central_lon - carrington_lon.to_numpy(dtype=float) + 180) % 360 - 180) / 360
+        rotation = np.where(np.isnan(offset), rotation, rotation + offset)
+    return np.floor(rotation)
+
+
+def absolute_flux(df):
+    # peak_flux is the multiplier after the class letter (X2.6 -> 2.6); W/m², 0 when unknown
+    scale = df["x_ray_class"].map(CLASS_FLUX).astype(float)
+    return (pd.to_numeric(df["peak_flux"], errors="coerce") * scale).fillna(0.0)
+
+
+def event_measures(df):
+    return pd.DataFrame({
+        "flares": 1,
+        "x_class": (df["x_ray_class"] == "X").astype(int),
+        "m_class": (df["x_ray_class"] == "M").astype(int),
+        "cme": df["isCMEFlare"].astype(int),
+        "protons": df["isProtonFlare"].astype(int),
+        "flux": absolute_flux(df),
+    }, index=df.index)
+
+
+def period_keys(df, freq):
+    date = pd.to_datetime(df["date"])
+    if freq == "CR":
+        return pd.Series(carrington_rotation(date, df.get("carrington_Lon")), index=df.index).astype("Int64")
+    if freq == "D":
+        return date.dt.floor("D")
+    return date.dt.to_period(freq).dt.start_time
+
+
+def rollup(df, freq):
+    data = df[df["date"].notna()]
+    table = event_measures(data).groupby(period_keys(data, freq).rename("period")).sum()
+    return table.sort_index()
+
+
+class Rollups:
+    """Матеріалізовані агрегати каталогу; нові події додаються інкрементально."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    @classmethod
+    def from_events(cls, df):
+        return cls({freq: rollup(df, freq) for freq in FREQS})
+
+    def update(self, new_events):
+        for freq in FREQS:
+            merged = self.tables[freq].add(rollup(new_events, freq), fill_value=0).sort_index()
+            merged[COUNT_COLUMNS] = merged[COUNT_COLUMNS].astype(int)
+            self.tables[freq] = merged
+        return self
+
+    def series(self, freq):
+        """Таблиця для графіків трендів: частота, кумулятивний потік, частки CME/протонних."""
+        table = self.tables[freq].copy()
+        table["cumulative_flux"] = table["flux"].cumsum()
+        table["cme_fraction"] = table["cme"] / table["flares"]
+        table["proton_fraction"] = table["protons"] / table["flares"]
+        return table.reset_index()
+
+    def write(self, path):
+        # One long table: period as int64 (ns for D/M, rotation number for CR)
+        parts = []
+        for freq, table in self.tables.items():
+            part = table.reset_index()
+            part["period"] = pd.to_numeric(part["period"]).astype("int64")
+            part.insert(0, "freq", freq)
+            parts.append(part)
+        with atomic_path(path) as tmp_path:
+            pd.concat(parts, ignore_index=True).to_parquet(tmp_path, index=False)
+
+    @classmethod
+    def read(cls, path):
+        data = pd.read_parquet(path)
+        tables = {}
+        for freq in FREQS:
+            table = data[data["freq"] == freq].drop(columns="freq")
+            if freq == "CR":
+                table["period"] = table["period"].astype("Int64")
+            else:
+                table["period"] = pd.to_datetime(table["period"])
+            tables[freq] = table.set_index("period")
+        return cls(tables)
+
+
+def rollups_path_for(catalog_path):
+    return os.path.splitext(catalog_path)[0] + ".rollups.parquet"
+
+
+def rollups_are_fresh(path, catalog_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(catalog_path)
+
+
+def update_rollups(new_events, catalog_path, all_events=None):
+    """Після дописування в каталог: додає до збережених агрегатів лише нові події.
+
+    Якщо передано all_events (збережені агрегати відсутні чи застарілі) — перебудова з нуля.
+    """
+    if not HAS_PYARROW:
+        return None
+    path = rollups_path_for(catalog_path)
+    if all_events is None:
+        rollups = Rollups.read(path).update(new_events)
+    else:
+        rollups = Rollups.from_events(all_events)
+    rollups.write(path)
+    return rollups
+
+
+def get_rollups(df, dataset_key):
+    """Агрегати для набору даних: з файлу поруч із каталогом або пораховані в пам'яті."""
+    rollups = ROLLUP_CACHE.get(dataset_key)
+    if rollups is not None:
+        return rollups
+    catalog_path = df.attrs.get("catalog_path")
+    if catalog_path and HAS_PYARROW:
+        path = rollups_path_for(catalog_path)
+        with file_lock(catalog_path):
+            if rollups_are_fresh(path, catalog_path):
+                rollups = Rollups.read(path)
+            else:
+                rollups = Rollups.from_events(df)
+                # Stored only if df is still the catalog on disk (fingerprint as read_catalog sets it)
+                if df.attrs.get("fingerprint") == f"{catalog_path}@{os.stat(catalog_path).st_mtime_ns}":
+                    rollups.write(path)
+    else:
+        rollups = Rollups.from_events(df)
+    ROLLUP_CACHE.put(dataset_key, rollups)
+    return rollups
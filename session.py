@@ -0,0 +1,111 @@
+import json
+import os
+import pandas as pd
+import streamlit as st
+from function import ENRICH_CACHE, enrich, is_memory_reported, memory_report
+from catalog import load_catalog
+from export import EXPORT_FORMATS, available_formats, export_bytes, is_exported
+from instrument import Timings
+
+# Перезапусків сторінок, що зберігаються для експорту в JSON
+TIMINGS_HISTORY = 20
+
+
+def load_dataframe(src):
+    """Читання CSV / Excel чи UploadedFile у DataFrame (dtype=str)."""
+    if isinstance(src, str):
+        return pd.read_csv(src, dtype=str)
+    ext = os.path.splitext(src.name)[-1].lower()
+    if ext == ".xlsx":
+        return pd.read_excel(src, dtype=str)
+    return pd.read_csv(src, dtype=str)
+
+
+def set_session_df(df, source):
+    """Нові дані в session state; кеш збагачення спільний для всіх сесій, старі записи витісняє LRU."""
+    st.session_state.df = df
+    st.session_state.df_source = source
+
+
+def load_enriched(uploaded_file, default_path, columns=None):
+    """Збагачений DataFrame поточного джерела; файл за замовчуванням читається з типізованого каталогу."""
+    if uploaded_file is not None and st.session_state.get("df_source") != uploaded_file.file_id:
+        set_session_df(load_dataframe(uploaded_file), uploaded_file.file_id)
+    if "df" in st.session_state:
+        return enrich(st.session_state.df)
+    if os.path.exists(default_path):
+        return load_catalog(default_path, columns)
+    return None
+
+
+def show_cache_stats():
+    with st.sidebar.expander("🗄️ Кеш обробки"):
+        stats = ENRICH_CACHE.stats()
+        st.caption(
+            f"Влучання: {stats['hits']} · Промахи: {stats['misses']} · "
+            f"Записів: {stats['size']}/{stats['maxsize']}"
+        )
+
+
+def show_memory_report(df):
+    # Порівняння з широкими типами будує копію всього набору — лише на запит, далі з кешу
+    with st.sidebar.expander("💾 Пам'ять даних"):
+        if not is_memory_reported(df) and not st.button("📏 Порахувати", key="memory_report"):
+            return
+        report = memory_report(df)
+        before, after = report["before_kb"].sum() / 1024, report["after_kb"].sum() / 1024
+        st.caption(f"{after:.1f} МБ замість {before:.1f} МБ (−{before - after:.1f} МБ)")
+        st.dataframe(report[report["saved_kb"] > 0].round(1), use_container_width=True)
+
+
+def show_download(df, file_stem, key=None):
+    """Завантаження у вибраному форматі; файл будується лише на запит і кешується."""
+    fmt = st.radio(
+        "Формат файлу", available_formats(), format_func=lambda f: EXPORT_FORMATS[f][0],
+        horizontal=True, key=f"{file_stem}_format",
+    )
+    label, mime = EXPORT_FORMATS[fmt]
+    if not is_exported(df, fmt, key):
+        if not st.button(f"📦 Підготувати {label}", key=f"{file_stem}_prepare"):
+            return
+        with st.spinner(f"Формування {label}…"):
+            export_bytes(df, fmt, key)
+    st.download_button(
+        label=f"📥 Завантажити {label}",
+        data=export_bytes(df, fmt, key),
+        file_name=f"{file_stem}.{fmt}",
+        mime=mime,
+        key=f"{file_stem}_download",
+    )
+
+
+def start_timings(page):
+    """Інструментування перезапуску сторінки; панель у боковій панелі оновлюється після кожного етапу."""
+    panel = st.sidebar.expander("⏱️ Етапи обробки")
+    placeholder = panel.empty()
+    history = st.session_state.setdefault("timings_history", [])
+    timings = Timings(page, on_update=lambda t: show_timings(placeholder, t, history))
+    if not timings.memory:
+        panel.caption("Пік пам'яті — якщо сервер запущено з PYTHONTRACEMALLOC=1 (повільніше).")
+    history.append(timings)
+    del history[:-TIMINGS_HISTORY]
+    return timings
+
+
+def show_timings(placeholder, timings, history):
+    # Перемальовується після кожного етапу, тож панель актуальна і після st.stop()
+    with placeholder.container():
+        st.caption(f"{timings.page}: {timings.total_seconds:.2f} с з початку перезапуску")
+        table = pd.DataFrame(timings.to_dict()["stages"]).rename(columns={
+            "stage": "Етап", "calls": "Викликів", "seconds": "с", "rows": "Рядків", "peak_mb": "Пік, МБ",
+        }).astype({"Рядків": "Int64"})
+        if not timings.memory:
+            table = table.drop(columns="Пік, МБ")
+        st.dataframe(table, hide_index=True, use_container_width=True)
+        st.download_button(
+            label=f"📥 JSON (останні {len(history)} перезапусків)",
+            data=json.dumps([t.to_dict() for t in history], ensure_ascii=False, indent=2),
+            file_name="timings.json",
+            mime="application/json",
+            key=f"timings_json_{sum(r['calls'] for r in timings.records.values())}",
+        )
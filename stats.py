@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from function import LRUCache
+
+NS_PER_DAY = 86400 * 10**9
+
+# DateIndex for each loaded dataset, keyed by its fingerprint
+DATE_INDEX_CACHE = LRUCache(maxsize=4)
+# cycle_statistics tables, keyed the same way
+CYCLE_STATS_CACHE = LRUCache(maxsize=4)
+
+
+def cycle_statistics(df, by="cycle"):
+    """Кількість спалахів, CME та протонних подій по циклах за один grouped-прохід.
+
+    CME/протонні події рахуються за прапорцями isCMEFlare/isProtonFlare з addColumns.
+    """
+    stats = (
+        df.groupby(by, sort=True, observed=True)
+        .agg(total=("isCMEFlare", "size"), cme=("isCMEFlare", "sum"), protons=("isProtonFlare", "sum"))
+        .astype(int)
+    )
+    stats["cme_percent"] = stats["cme"] / stats["total"] * 100
+    stats["proton_percent"] = stats["protons"] / stats["total"] * 100
+    return stats.reset_index()
+
+
+def hemisphere_trends(df, by="cycle", hemisphere="lat_hemisphere", x="date", y="lat"):
+    """Лінійні тренди y(x) для кожної пари (цикл, півкуля) — замкнена формула МНК по групах.
+
+    slope/intercept відповідають np.polyfit(pd.to_numeric(date), lat, 1).
+    """
+    data = df.dropna(subset=[x, y, hemisphere])
+    keys = [data[by], data[hemisphere]]
+    x_ns = pd.to_numeric(data[x])
+    # x відносно початку групи, у днях: без втрати точності на наносекундних мітках
+    x0 = x_ns.groupby(keys, observed=True).transform("min")
+    xd = (x_ns - x0) / NS_PER_DAY
+    yv = data[y].astype(float)
+
+    sums = pd.DataFrame({
+        "n": 1, "sx": xd, "sy": yv, "sxx": xd * xd, "sxy": xd * yv, "x0": x0, "x_max": x_ns,
+    }).groupby(keys, observed=True).agg({
+        "n": "sum", "sx": "sum", "sy": "sum", "sxx": "sum", "sxy": "sum", "x0": "first", "x_max": "max",
+    })
+    n = sums["n"]
+    denom = n * sums["sxx"] - sums["sx"] ** 2
+    slope_days = (n * sums["sxy"] - sums["sx"] * sums["sy"]) / denom.where(denom != 0)
+    intercept_rel = (sums["sy"] - slope_days * sums["sx"]) / n
+
+    trends = pd.DataFrame({
+        "n": n,
+        "slope": slope_days / NS_PER_DAY,
+        "intercept": intercept_rel - slope_days * sums["x0"] / NS_PER_DAY,
+        "x_min": sums["x0"],
+        "x_max": sums["x_max"],
+    })
+    trends.index.names = [by, hemisphere]
+    return trends[(trends["n"] >= 2) & trends["slope"].notna()].reset_index()
+
+
+class DateIndex:
+    """Каталог, відсортований за датою: діапазон дат вибирається через searchsorted,
+    кількості спалахів по днях і місяцях пораховані наперед кумулятивними масивами.
+    """
+
+    def __init__(self, df, column="date"):
+        if not df[column].is_monotonic_increasing:
+            df = df.sort_values(column, kind="stable")
+        dates = df[column].to_numpy(dtype="datetime64[ns]")
+        # NaT опиняються в кінці після сортування — в індекс не потрапляють
+        n_valid = int((~np.isnat(dates)).sum())
+        self.df = df
+        self.dates = dates[:n_valid]
+        self.periods = {}
+        for freq in ("D", "M"):
+            periods, counts = np.unique(self.dates.astype(f"datetime64[{freq}]"), return_counts=True)
+            self.periods[freq] = (periods, np.concatenate([[0], np.cumsum(counts)]))
+
+    def bounds(self, start, end):
+        # [start, end] включно — як date >= start & date <= end
+        start = np.datetime64(pd.Timestamp(start), "ns")
+        end = np.datetime64(pd.Timestamp(end), "ns")
+        return np.searchsorted(self.dates, start, "left"), np.searchsorted(self.dates, end, "right")
+
+    def select(self, start, end):
+        i, j = self.bounds(start, end)
+        return self.df.iloc[i:j]
+
+    def counts(self, start, end, freq="D"):
+        """Кількість спалахів по днях ("D") чи місяцях ("M") у діапазоні — зріз наперед порахованих масивів."""
+        periods, cumsum = self.periods[freq]
+        lo = np.datetime64(pd.Timestamp(start), freq)
+        hi = np.datetime64(pd.Timestamp(end), freq)
+        i, j = np.searchsorted(periods, lo, "left"), np.searchsorted(periods, hi, "right")
+        return pd.DataFrame({"date": periods[i:j].astype("datetime64[ns]"), "count": np.diff(cumsum[i:j + 1])})
@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "extracted_data.csv")
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    # The bundled catalog, enriched
+    from function import enrich
+
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("немає data/extracted_data.csv")
+    return enrich(pd.read_csv(CSV_PATH, dtype=str))
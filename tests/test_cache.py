@@ -0,0 +1,54 @@
+import threading
+
+import pandas as pd
+
+import function
+from function import (
+    DEFAULT_COLUMN_SLICES, ENRICH_CACHE, LRUCache, addColumns, cache_enriched, concat_batches, enrich, slice_lines,
+)
+from tests.test_parsers import CSV_PATH, bundled_lines
+
+
+def test_lru_cache_survives_concurrent_get_and_put():
+    cache = LRUCache(maxsize=4)
+    errors = []
+
+    def hammer(offset):
+        try:
+            for i in range(20_000):
+                cache.put((offset + i) % 16, i)
+                cache.get((offset + i + 1) % 16)
+        except Exception as e:  # KeyError from a get racing an eviction
+            errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert cache.stats()["size"] <= 4
+
+
+def test_enrich_hashes_a_raw_frame_once(monkeypatch):
+    raw = pd.read_csv(CSV_PATH, dtype=str).head(200)
+    ENRICH_CACHE.clear()
+    first = enrich(raw)
+
+    def no_rehash(df):
+        raise AssertionError("the frame was hashed again")
+
+    monkeypatch.setattr(function, "dataset_fingerprint", no_rehash)
+    assert enrich(raw) is first
+
+
+def test_batched_parse_is_found_by_the_next_enrich():
+    # FileProcessing enriches the first read page batch by page batch; a rerun slices the
+    # cached lines again and must get the same frame back from ENRICH_CACHE
+    lines = bundled_lines()
+    ENRICH_CACHE.clear()
+    batches = [addColumns(slice_lines(lines[i:i + 500], DEFAULT_COLUMN_SLICES)) for i in range(0, len(lines), 500)]
+    streamed = cache_enriched(slice_lines(lines, DEFAULT_COLUMN_SLICES), concat_batches(batches))
+    rerun = enrich(slice_lines(lines, DEFAULT_COLUMN_SLICES))
+    assert rerun is streamed
+    pd.testing.assert_frame_equal(rerun, addColumns(slice_lines(lines, DEFAULT_COLUMN_SLICES)))
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+from catalog import append_catalog, appended_keys, catalog_path_for, load_catalog, natural_key
+from function import addColumns
+from ingest import write_output
+from tests.test_parsers import CSV_PATH
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def bundled_rows():
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("немає data/extracted_data.csv")
+    raw = pd.read_csv(CSV_PATH, dtype=str)
+    return raw[~natural_key(raw).duplicated()].head(400).reset_index(drop=True)
+
+
+def write_csv(raw, csv_path):
+    raw.to_csv(csv_path, index=False)
+    # A rewrite within the same mtime tick would look unchanged to the stat check
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def coords(df):
+    return set(df["coord"].fillna("").str.upper())
+
+
+def test_append_skips_known_and_repeated_events(tmp_path, bundled_rows):
+    csv_path = str(tmp_path / "catalog.csv")
+    write_csv(bundled_rows.head(300), csv_path)
+    path = catalog_path_for(csv_path)
+
+    new = bundled_rows.iloc[300:]
+    batch = pd.concat([bundled_rows.iloc[250:300], new, new.head(10)], ignore_index=True)
+    assert append_catalog(batch, path, csv_path) == (100, 60)
+    assert append_catalog(new, path, csv_path) == (0, 100)
+    assert len(load_catalog(csv_path)) == 400
+    assert set(appended_keys(path)) == set(natural_key(new))
+
+
+def test_resync_keeps_only_appended_events(tmp_path, bundled_rows):
+    csv_path = str(tmp_path / "catalog.csv")
+    csv_rows = bundled_rows.head(300).copy()
+    write_csv(csv_rows, csv_path)
+    path = catalog_path_for(csv_path)
+    append_catalog(bundled_rows.iloc[300:], path, csv_path)
+
+    # One coord edited and one row deleted in the CSV: neither old version survives
+    old_coord = csv_rows.loc[0, "coord"]
+    csv_rows.loc[0, "coord"] = "S89W89"
+    csv_rows = csv_rows.drop(index=1)
+    write_csv(csv_rows, csv_path)
+
+    df = load_catalog(csv_path)
+    assert len(df) == 399
+    assert "S89W89" in coords(df)
+    expected = natural_key(pd.concat([csv_rows, bundled_rows.iloc[300:]]))
+    assert set(natural_key(df)) == set(expected)
+
+
+def test_rebuild_drops_events_repeated_across_bulletins(tmp_path, bundled_rows):
+    df = addColumns(bundled_rows.copy())
+    output = str(tmp_path / "catalog.csv")
+    write_output(pd.concat([df, df], ignore_index=True), output)
+    assert len(pd.read_csv(output, dtype=str)) == 400
+    assert len(load_catalog(output)) == 400
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+
+from clustering import KDIST_CACHE, MODEL_CACHE, NEIGHBOR_CACHE, fit_clusters, k_distances
+
+
+@pytest.mark.parametrize("min_samples", [1, 5, 12, 25])
+def test_k_distances_mark_dbscan_core_points(min_samples):
+    rng = np.random.default_rng(0)
+    X = np.vstack([rng.normal(0, 0.3, size=(200, 2)), rng.uniform(-3, 3, size=(50, 2))])
+    distances = k_distances(X, "kdist", ["a", "b"], min_samples)
+    assert (np.diff(distances) >= 0).all()
+    for eps in (0.1, 0.3, 1.0):
+        core = DBSCAN(eps=eps, min_samples=min_samples).fit(X).core_sample_indices_
+        assert (distances <= eps).sum() == len(core)
+
+
+def test_kmeans_warm_starts_only_on_a_miss():
+    MODEL_CACHE.clear()
+    X = np.random.default_rng(0).normal(size=(300, 3))
+    features = ["a", "b", "c"]
+    previous, fits = None, 0
+    for k in (3, 6, 3, 5, 3):
+        previous, hit = fit_clusters(X, "warm", features, "KMeans", {"k": k}, previous)
+        fits += not hit
+        assert previous.params["k"] == k
+    assert fits == 3
+
+
+def test_k_distance_curves_share_one_neighbor_search(monkeypatch):
+    NEIGHBOR_CACHE.clear()
+    KDIST_CACHE.clear()
+    X = np.random.default_rng(0).normal(size=(100, 2))
+    first = k_distances(X, "shared", ["a", "b"], 5)
+    monkeypatch.setattr("clustering.NearestNeighbors", None)
+    assert k_distances(X, "shared", ["a", "b"], 5) is first
+    assert len(k_distances(X, "shared", ["a", "b"], 8)) == len(X)
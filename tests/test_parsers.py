@@ -0,0 +1,190 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from function import (
+    DEFAULT_COLUMN_SLICES, addColumns, slice_lines, parse_flare_column, parse_flare_df, parse_solar_coordinates, parse_solar_coordinates_column,
+)
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "extracted_data.csv")
+
+COORD_EDGE_CASES = [
+    "", "NAN", "N12", "N12E", "S05W10L", "S05W10L200", "N00E00L000", "N12E05L123XYZ",
+    " N12E05L123", "X12E05L123", "N12 E05L123", "S1W1L1", "N123E045L360",
+]
+FLARE_EDGE_CASES = [
+    "", "nan", "X", "M/1B", "X/", "Z1.0", "1B/2N", "X2.6/1B", "1B/X2.6", "SF/C1.5", "C1.5/SF",
+    "Х2.6/1B", "М1.0", "1N/Х3", "M>2.0", "X<1", "X10/4B", "B5.5/F", "C1.2/", "C1.2/B", "1B/X2.6/2N",
+    "F/M1.0", "SN/M", "C1.5extra",
+]
+
+
+def bundled_column(name):
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("немає data/extracted_data.csv")
+    return pd.read_csv(CSV_PATH, dtype=str)[name].fillna("")
+
+
+def scalar_frame(values, parser, columns):
+    return pd.DataFrame([parser(v) for v in values], columns=columns, index=values.index)
+
+
+def assert_same(vectorized, scalar):
+    # Same values and missing positions; numbers compared as float, labels as strings
+    for col in scalar.columns:
+        left, right = vectorized[col], scalar[col]
+        assert (left.isna() == right.isna()).all(), col
+        present = left.notna()
+        if pd.api.types.is_numeric_dtype(left):
+            np.testing.assert_array_equal(left[present].astype(float), right[present].astype(float), err_msg=col)
+        else:
+            assert (left[present].astype(str) == right[present].astype(str)).all(), col
+
+
+COORD_COLUMNS = ["lat", "lon", "carrington_Lon", "lat_hemisphere", "lon_hemisphere"]
+FLARE_COLUMNS = ["x_ray_class", "peak_flux", "importance", "brightness"]
+
+
+@pytest.mark.parametrize("values", [
+    pd.Series(COORD_EDGE_CASES),
+    "bundled",
+])
+def test_coordinates_match_scalar_parser(values):
+    if isinstance(values, str):
+        values = bundled_column("coord").str.upper()
+    assert_same(
+        parse_solar_coordinates_column(values),
+        scalar_frame(values, parse_solar_coordinates, COORD_COLUMNS),
+    )
+
+
+@pytest.mark.parametrize("values", [
+    pd.Series(FLARE_EDGE_CASES),
+    "bundled",
+])
+def test_flares_match_scalar_parser(values):
+    if isinstance(values, str):
+        values = bundled_column("xray/opt")
+    assert_same(
+        parse_flare_column(values),
+        scalar_frame(values, parse_flare_df, FLARE_COLUMNS),
+    )
+
+
+RAW_COLUMNS = ["ymd", "to", "tm", "te", "xray/opt", "L", "coord", "AR", "radio", "mhr",
+               "dynamic", "sweep", "CME", "xray-hard", "protons"]
+TIME_EDGE_CASES = [
+    ("0901", "0911", "0941"),
+    ("2256", "2332", "0047"),  # end past midnight
+    ("2359", "0000", "0000"),
+    ("0000", "0000", "0000"),
+    ("0901", "0911", ">0941"),
+    ("0901", "", ""),
+    ("", "0911", "0941"),
+    ("12", "ab", "1"),
+    ("B0901", "0911A", "09410"),
+]
+
+
+def reference_times(df):
+    # Row-wise time logic addColumns had before vectorization
+    def hhmm_to_timedelta(col):
+        digits = col.str.extract(r'(\d{4})')[0]
+        return pd.to_timedelta(digits.str[:2] + ":" + digits.str[2:] + ":00")
+
+    def hhmm(x):
+        if pd.isnull(x):
+            return None
+        return f"{int(x.total_seconds() // 3600):02d}:{int((x.total_seconds() % 3600) // 60):02d}"
+
+    to, te, tm = hhmm_to_timedelta(df["to"]), hhmm_to_timedelta(df["te"]), hhmm_to_timedelta(df["tm"])
+    te = te.where(~(te < to), te + pd.Timedelta(hours=24))
+    duration = te - to
+    return pd.DataFrame({
+        "toTime": to.map(hhmm),
+        "teTime": te.map(hhmm),
+        "tmTime": tm.map(hhmm),
+        "duration": duration,
+        "duration_minutes": duration.dt.total_seconds() / 60,
+        "duration_hhmm": duration.map(hhmm),
+    })
+
+
+def raw_frame(times):
+    df = pd.DataFrame(times, columns=["to", "tm", "te"])
+    for col in RAW_COLUMNS:
+        if col not in df:
+            df[col] = "20000101" if col == "ymd" else ""
+    return df[RAW_COLUMNS]
+
+
+@pytest.mark.parametrize("source", ["edge", "bundled"])
+def test_times_match_row_wise_version(source):
+    if source == "edge":
+        raw = raw_frame(TIME_EDGE_CASES)
+    else:
+        if not os.path.exists(CSV_PATH):
+            pytest.skip("немає data/extracted_data.csv")
+        raw = pd.read_csv(CSV_PATH, dtype=str)[RAW_COLUMNS]
+    expected = reference_times(raw)
+    assert_same(addColumns(raw.copy())[expected.columns], expected)
+
+
+SLICE_EDGE_LINES = [
+    "19960709  0901  0911  0941  X2.6/1B  0.073  S11W30L248 7978  1400  1100",
+    "",
+    "1996",
+    "19970829  2256  2332  0047  М1.4/SF  0.002  N30E17L105 8076",
+    "19970829\t2256 \xa0 2332",
+    "20000101  0100\x00 0200  0300  C1.0\x00",
+    "20000101  0100  0200  0300  C1.0   \x00\x00",
+    "\x00\x00\x00",
+    "x" * 200,
+]
+SLICE_LAYOUTS = [
+    {"ymd": (0, 9), "to": (9, 15), "rest": (15, None)},
+    {"a": (3, 3), "b": (150, 160), "c": (0, 1), "d": (5, 2)},
+    {"tail": (-5, None), "mid": (-10, -5), "head": (0, 4)},
+]
+
+
+def reference_slices(lines, column_slices):
+    # Per-line slicing the page did before the char-matrix version
+    rows = [
+        [line[start:end].strip() if end else line[start:].strip() for start, end in column_slices.values()]
+        for line in lines
+    ]
+    return pd.DataFrame(rows, columns=list(column_slices.keys()))
+
+
+@pytest.mark.parametrize("column_slices", [DEFAULT_COLUMN_SLICES] + SLICE_LAYOUTS)
+def test_slice_lines_matches_per_line_slicing(column_slices):
+    expected = reference_slices(SLICE_EDGE_LINES, column_slices)
+    pd.testing.assert_frame_equal(slice_lines(SLICE_EDGE_LINES, column_slices), expected)
+
+
+def test_slice_lines_keeps_nuls_past_the_longest_line():
+    # The unicode matrix is as wide as the longest line without its trailing NULs
+    lines = ["ab\x00\x00", "abc"]
+    column_slices = {"head": (0, 3), "tail": (3, None)}
+    pd.testing.assert_frame_equal(slice_lines(lines, column_slices), reference_slices(lines, column_slices))
+
+
+def bundled_lines():
+    # Bulletin lines rebuilt from the catalog: every field padded to its slice width
+    if not os.path.exists(CSV_PATH):
+        pytest.skip("немає data/extracted_data.csv")
+    raw = pd.read_csv(CSV_PATH, dtype=str)[RAW_COLUMNS].fillna("")
+    lines = pd.Series("", index=raw.index)
+    for col, (start, end) in DEFAULT_COLUMN_SLICES.items():
+        lines = lines.str.pad(start, side="right") + (raw[col] if end is None else raw[col].str.pad(end - start, side="right"))
+    return lines.str.rstrip().tolist()
+
+
+def test_slice_lines_matches_on_bundled_catalog():
+    lines = bundled_lines()
+    pd.testing.assert_frame_equal(
+        slice_lines(lines, DEFAULT_COLUMN_SLICES), reference_slices(lines, DEFAULT_COLUMN_SLICES)
+    )
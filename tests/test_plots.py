@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from plots import decimate, density_grid, lat_density
+
+
+def flares(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.to_datetime(rng.integers(0, 10**18, n)),
+        "lat": rng.normal(0, 20, n),
+        "x_ray_class": rng.choice(list("ABCMX"), n, p=[0.1, 0.4, 0.4, 0.08, 0.02]),
+    })
+
+
+@pytest.mark.parametrize("share_xm", [0.1, 0.98])
+@pytest.mark.parametrize("max_points", [200, 1000, 3000, 5000])
+def test_decimate_is_a_hard_cap(max_points, share_xm):
+    df = flares(20000)
+    df.loc[df.sample(frac=share_xm, random_state=0).index, "x_ray_class"] = "M"
+    thinned = decimate(df, max_points)
+    assert len(thinned) == max_points
+    assert thinned.index.is_unique and thinned.index.is_monotonic_increasing
+    # X/M go first: all of them when they fit in the budget, otherwise only X/M
+    n_xm = int(df["x_ray_class"].isin(["X", "M"]).sum())
+    assert thinned["x_ray_class"].isin(["X", "M"]).sum() == min(n_xm, max_points)
+
+def test_decimate_is_stable_and_skips_small_frames():
+    df = flares(5000)
+    assert decimate(df, 5000) is df
+    pd.testing.assert_frame_equal(decimate(df, 700), decimate(df, 700))
+
+
+def test_density_weights_peak_flux_by_class():
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2000-01-01", "2000-01-01"]),
+        "lat": [10.0, 10.0],
+        "x_ray_class": ["X", "M"],
+        "peak_flux": np.array([1.0, 2.0], dtype="float32"),
+    })
+    _, _, grid = density_grid(df, time_bins=1, lat_bins=1, weight="peak_flux")
+    assert grid.sum() == pytest.approx(1e-4 + 2e-5)
+    fig, filled, cells = lat_density(density_grid(df, time_bins=4, lat_bins=6), "")
+    assert (filled, cells) == (1, 24)
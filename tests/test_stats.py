@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats import hemisphere_trends
+
+
+def test_hemisphere_trends_match_polyfit(catalog):
+    trends = hemisphere_trends(catalog)
+    data = catalog.dropna(subset=["date", "lat", "lat_hemisphere"])
+    groups = data.groupby(["cycle", "lat_hemisphere"], observed=True)
+    assert len(trends) == sum(len(group) >= 2 for _, group in groups)
+    for row in trends.itertuples():
+        group = groups.get_group((row.cycle, row.lat_hemisphere))
+        slope, intercept = np.polyfit(pd.to_numeric(group["date"]), group["lat"].astype(float), 1)
+        assert row.n == len(group)
+        assert row.slope == pytest.approx(slope, rel=1e-6)
+        # intercept is lat at date 0 (1970): compare the fitted lines over the group's own dates
+        x = pd.to_numeric(group["date"]).to_numpy(dtype=float)
+        np.testing.assert_allclose(row.slope * x + row.intercept, slope * x + intercept, atol=1e-6)